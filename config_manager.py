@@ -1,15 +1,65 @@
 # config_manager.py
 
+import asyncio
+import hashlib
 import json
+import os
+import pickle
+from dataclasses import dataclass, field, fields, replace
 from pathlib import Path
-from typing import Dict, Any, Tuple, Optional, List
+from typing import Dict, Any, Tuple, Optional, List, Callable
 
 from astrbot.api import logger
 from .models import Item
+from .config_validation import (
+    LootTable, validate_tags, validate_templates, validate_item, check_loot_items, report_errors
+)
+
+# 预编译配置文件的格式版本；快照或派生数据的结构变化时需递增，使旧文件失效
+CONFIG_ARTIFACT_FORMAT = 2
+CONFIG_ARTIFACT_NAME = "config_cache.pkl"
+# 不参与配置构建的目录，其中的代码变化不影响预编译配置
+_CODE_DIGEST_EXCLUDE = {"tools", "tests", "__pycache__"}
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """一次完整加载得到的只读配置快照
+
+    快照创建后不再修改（derived 仅在构建阶段填充），处理指令时读到的始终是同一版本的数据。
+    """
+
+    version: int
+    level_data: List[dict]
+    item_data: Dict[str, Item]
+    boss_data: Dict[str, dict]
+    monster_data: Dict[str, dict]
+    realm_data: Dict[str, dict]
+    tag_data: Dict[str, dict]
+
+    # 每个标签编译后的掉落表
+    tag_loot: Dict[str, LootTable]
+
+    level_map: Dict[str, dict]
+    item_name_to_id: Dict[str, str]
+    realm_name_to_id: Dict[str, str]
+    boss_name_to_id: Dict[str, str]
+
+    # 构建快照时各数据文件的修改时间，用于判断是否需要重新加载
+    mtimes: Tuple[Optional[int], ...] = ()
+    # 依赖配置的派生数据（如怪物属性模板），随快照一起构建
+    derived: Dict[str, Any] = field(default_factory=dict)
+    # 派生数据的构建参数签名，用于判断预编译文件中的派生数据能否直接复用
+    derived_signatures: Dict[str, str] = field(default_factory=dict)
+    # 数据文件内容与插件代码的 sha256，作为预编译文件的键
+    source_digest: str = ""
+    # 加载时发现的配置问题，载入预编译结果时同样会再次报告
+    validation_errors: Tuple[str, ...] = ()
 
 class ConfigManager:
-    def __init__(self, base_dir: Path):
+    def __init__(self, base_dir: Path, artifact_dir: Optional[Path] = None):
         self._base_dir = base_dir
+        # 完成后处理的配置会序列化到该目录，数据文件未变化时下次启动直接载入
+        self._artifact_path = Path(artifact_dir) / CONFIG_ARTIFACT_NAME if artifact_dir else None
         self._paths = {
             "level": base_dir / "config" / "level_config.json",
             "item": base_dir / "config" / "items.json",
@@ -19,68 +69,300 @@ class ConfigManager:
             "tag": base_dir / "config" / "tags.json"
         }
 
-        self.level_data: List[dict] = []
-        self.item_data: Dict[str, Item] = {}
-        self.boss_data: Dict[str, dict] = {}
-        self.monster_data: Dict[str, dict] = {}
-        self.realm_data: Dict[str, dict] = {}
-        self.tag_data: Dict[str, dict] = {}
+        # 派生数据由代码中的公式计算，插件升级后即使数据文件未变，旧的预编译结果也不能复用
+        self._code_digest = self._compute_code_digest(base_dir)
+        self._derived_builders: Dict[str, Tuple[Callable[[ConfigSnapshot], Any], Optional[str]]] = {}
+        self._reload_lock = asyncio.Lock()
+        self._watch_task: Optional[asyncio.Task] = None
+
+        self._snapshot = self._build_snapshot(version=1)
+
+    # --- 快照访问：所有读取都经由当前快照 ---
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @property
+    def level_data(self) -> List[dict]:
+        return self._snapshot.level_data
+
+    @property
+    def item_data(self) -> Dict[str, Item]:
+        return self._snapshot.item_data
+
+    @property
+    def boss_data(self) -> Dict[str, dict]:
+        return self._snapshot.boss_data
+
+    @property
+    def monster_data(self) -> Dict[str, dict]:
+        return self._snapshot.monster_data
+
+    @property
+    def realm_data(self) -> Dict[str, dict]:
+        return self._snapshot.realm_data
+
+    @property
+    def tag_data(self) -> Dict[str, dict]:
+        return self._snapshot.tag_data
+
+    @property
+    def level_map(self) -> Dict[str, dict]:
+        return self._snapshot.level_map
+
+    @property
+    def item_name_to_id(self) -> Dict[str, str]:
+        return self._snapshot.item_name_to_id
+
+    @property
+    def realm_name_to_id(self) -> Dict[str, str]:
+        return self._snapshot.realm_name_to_id
+
+    @property
+    def boss_name_to_id(self) -> Dict[str, str]:
+        return self._snapshot.boss_name_to_id
+
+    # --- 加载与重载 ---
+
+    def add_derived_builder(self, name: str, builder: Callable[[ConfigSnapshot], Any],
+                            signature: Optional[str] = None):
+        """注册派生数据构建函数；每次构建快照时调用，结果存入 snapshot.derived[name]
+
+        signature 描述构建参数，签名一致时可直接复用预编译文件中的结果。
+        """
+        self._derived_builders[name] = (builder, signature)
+        if self._build_derived(self._snapshot):
+            self._save_artifact(self._snapshot)
 
-        self.level_map: Dict[str, dict] = {}
-        self.item_name_to_id: Dict[str, str] = {}
-        self.realm_name_to_id: Dict[str, str] = {}
-        self.boss_name_to_id: Dict[str, str] = {}
+    async def reload_async(self) -> ConfigSnapshot:
+        """在线程中构建新快照，完成后一次性切换，不阻塞事件循环"""
+        async with self._reload_lock:
+            snapshot = await asyncio.to_thread(self._build_snapshot, self._snapshot.version + 1, True)
+            self._swap(snapshot)
+            return snapshot
 
-        self._load_all()
+    def _swap(self, snapshot: ConfigSnapshot):
+        self._snapshot = snapshot
+        logger.info(f"修仙配置已切换到版本 {snapshot.version}。")
 
-    def _load_json_data(self, file_path: Path) -> Any:
-        if not file_path.exists():
+    def start_watching(self, interval: float):
+        """按 interval 秒轮询数据文件的修改时间，发现变化后自动重载"""
+        if interval > 0 and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch_loop(interval))
+
+    async def stop_watching(self):
+        if self._watch_task:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            mtimes = await asyncio.to_thread(self._source_mtimes)
+            if mtimes == self._snapshot.mtimes:
+                continue
+            logger.info("检测到修仙配置文件变化，开始重新加载...")
+            try:
+                await self.reload_async()
+            except Exception as e:
+                # 保留旧快照，并记下本次文件状态，避免对同一份损坏的文件反复重载
+                logger.error(f"重新加载修仙配置失败，继续使用版本 {self._snapshot.version}: {e}")
+                self._snapshot = replace(self._snapshot, mtimes=mtimes)
+
+    def _source_mtimes(self) -> Tuple[Optional[int], ...]:
+        mtimes = []
+        for path in self._paths.values():
+            try:
+                mtimes.append(path.stat().st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _load_json_data(self, file_path: Path, raw: Optional[bytes], strict: bool = False,
+                        failures: Optional[List[str]] = None) -> Any:
+        if raw is None:
             logger.warning(f"数据文件 {file_path} 不存在，将使用空数据。")
             return {} if file_path.suffix == '.json' else []
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                logger.info(f"成功加载 {file_path.name} (共 {len(data)} 条数据)。")
-                return data
+            data = json.loads(raw.decode('utf-8'))
+            logger.info(f"成功加载 {file_path.name} (共 {len(data)} 条数据)。")
+            return data
         except Exception as e:
+            if strict:
+                raise
             logger.error(f"加载数据文件 {file_path} 失败: {e}")
+            if failures is not None:
+                failures.append(file_path.name)
             return {} if file_path.suffix == '.json' else []
 
-    def _load_all(self):
-        """加载所有数据文件并进行后处理"""
-        self.level_data = self._load_json_data(self._paths["level"])
-        raw_item_data = self._load_json_data(self._paths["item"])
-        self.boss_data = self._load_json_data(self._paths["boss"])
-        self.monster_data = self._load_json_data(self._paths["monster"])
-        self.realm_data = self._load_json_data(self._paths["realm"])
-        self.tag_data = self._load_json_data(self._paths["tag"])
+    def _read_sources(self) -> Dict[str, Optional[bytes]]:
+        sources = {}
+        for key, path in self._paths.items():
+            try:
+                sources[key] = path.read_bytes()
+            except FileNotFoundError:
+                sources[key] = None
+        return sources
+
+    @staticmethod
+    def _compute_code_digest(base_dir: Path) -> str:
+        h = hashlib.sha256()
+        for path in sorted(base_dir.rglob("*.py")):
+            relative = path.relative_to(base_dir)
+            if _CODE_DIGEST_EXCLUDE.intersection(relative.parts):
+                continue
+            h.update(relative.as_posix().encode() + b"\0")
+            h.update(path.read_bytes())
+        return h.hexdigest()
+
+    def _source_digest(self, sources: Dict[str, Optional[bytes]]) -> str:
+        h = hashlib.sha256(f"format={CONFIG_ARTIFACT_FORMAT};code={self._code_digest}".encode())
+        for key in sorted(sources):
+            raw = sources[key]
+            h.update(key.encode())
+            h.update(b"\0missing" if raw is None else len(raw).to_bytes(8, "little") + raw)
+        return h.hexdigest()
+
+    def _load_artifact(self, digest: str) -> Optional[ConfigSnapshot]:
+        if not self._artifact_path or not self._artifact_path.exists():
+            return None
+        try:
+            with open(self._artifact_path, 'rb') as f:
+                cached_digest, snapshot = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"读取预编译配置失败，将重新解析数据文件: {e}")
+            return None
+        if cached_digest != digest or not isinstance(snapshot, ConfigSnapshot):
+            return None
+        # 旧结构的快照可以被反序列化，但缺少新增字段
+        if not all(hasattr(snapshot, f.name) for f in fields(ConfigSnapshot)):
+            logger.warning("预编译配置结构已过期，将重新解析数据文件。")
+            return None
+        return snapshot
+
+    def _save_artifact(self, snapshot: ConfigSnapshot):
+        if not self._artifact_path:
+            return
+        tmp_path = self._artifact_path.with_suffix(".tmp")
+        try:
+            self._artifact_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((snapshot.source_digest, snapshot), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._artifact_path)
+        except Exception as e:
+            logger.warning(f"写入预编译配置失败: {e}")
+
+    def _build_derived(self, snapshot: ConfigSnapshot) -> bool:
+        """构建签名不匹配或缺失的派生数据，返回是否有更新"""
+        changed = False
+        for name, (builder, signature) in self._derived_builders.items():
+            if signature is not None and name in snapshot.derived and snapshot.derived_signatures.get(name) == signature:
+                continue
+            snapshot.derived[name] = builder(snapshot)
+            if signature is not None:
+                snapshot.derived_signatures[name] = signature
+            changed = True
+        return changed
+
+    def _build_snapshot(self, version: int, strict: bool = False) -> ConfigSnapshot:
+        """加载所有数据文件并进行后处理
+
+        strict 为 True 时（重载），文件解析失败会抛出异常，避免用空数据替换现有配置。
+        数据文件内容与上次相同时直接载入预编译结果。
+        """
+        # 先记录修改时间再读取，读取期间发生的修改会在下一次轮询时被发现
+        mtimes = self._source_mtimes()
+        sources = self._read_sources()
+        digest = self._source_digest(sources)
+
+        cached = self._load_artifact(digest)
+        if cached is not None:
+            try:
+                snapshot = replace(cached, version=version, mtimes=mtimes)
+                logger.info(f"已载入预编译配置 (物品 {len(snapshot.item_data)} 件，怪物 {len(snapshot.monster_data)} 种)。")
+                report_errors(snapshot.validation_errors)
+                if self._build_derived(snapshot):
+                    self._save_artifact(snapshot)
+                return snapshot
+            except Exception as e:
+                logger.warning(f"预编译配置内容无效，将重新解析数据文件: {e}")
+
+        failures: List[str] = []
+        level_data = self._load_json_data(self._paths["level"], sources["level"], strict, failures)
+        raw_item_data = self._load_json_data(self._paths["item"], sources["item"], strict, failures)
+        raw_boss_data = self._load_json_data(self._paths["boss"], sources["boss"], strict, failures)
+        raw_monster_data = self._load_json_data(self._paths["monster"], sources["monster"], strict, failures)
+        realm_data = self._load_json_data(self._paths["realm"], sources["realm"], strict, failures)
+        raw_tag_data = self._load_json_data(self._paths["tag"], sources["tag"], strict, failures)
+
+        errors: List[str] = []
+        tag_data, tag_loot = validate_tags(raw_tag_data, errors)
+        monster_data = validate_templates(raw_monster_data, "monsters.json", set(tag_data), errors)
+        boss_data = validate_templates(raw_boss_data, "bosses.json", set(tag_data), errors, require_cooldown=True)
 
-        self.level_map = {info["level_name"]: {"index": i, **info}
-                          for i, info in enumerate(self.level_data) if "level_name" in info}
+        level_map = {info["level_name"]: {"index": i, **info}
+                     for i, info in enumerate(level_data) if "level_name" in info}
 
-        self.item_data = {}
-        self.item_name_to_id = {}
+        item_data = {}
+        item_name_to_id = {}
         for item_id, info in raw_item_data.items():
+            info = validate_item(item_id, info, errors)
+            if info is None:
+                continue
             try:
-                self.item_data[item_id] = Item(id=item_id, **info)
+                item_data[item_id] = Item(id=item_id, **info)
                 if "name" in info:
-                    self.item_name_to_id[info["name"]] = item_id
+                    item_name_to_id[info["name"]] = item_id
             except TypeError as e:
-                logger.error(f"加载物品 {item_id} 失败，配置项不匹配: {e}")
+                errors.append(f"items.json[{item_id}]: 配置项不匹配: {e}")
+        check_loot_items(tag_loot, set(item_data), errors)
+        report_errors(errors)
 
-        self.realm_name_to_id = {info["name"]: realm_id
-                                 for realm_id, info in self.realm_data.items() if "name" in info}
-        self.boss_name_to_id = {info["name"]: boss_id
-                                for boss_id, info in self.boss_data.items() if "name" in info}
+        snapshot = ConfigSnapshot(
+            version=version,
+            level_data=level_data,
+            item_data=item_data,
+            boss_data=boss_data,
+            monster_data=monster_data,
+            realm_data=realm_data,
+            tag_data=tag_data,
+            tag_loot=tag_loot,
+            level_map=level_map,
+            item_name_to_id=item_name_to_id,
+            realm_name_to_id={info["name"]: realm_id
+                              for realm_id, info in realm_data.items() if "name" in info},
+            boss_name_to_id={info["name"]: boss_id
+                             for boss_id, info in boss_data.items() if "name" in info},
+            mtimes=mtimes,
+            source_digest=digest,
+            validation_errors=tuple(errors)
+        )
+        self._build_derived(snapshot)
+        if not failures:
+            # 有文件解析失败时不缓存，下次启动仍会重新解析并报告错误
+            self._save_artifact(snapshot)
+        return snapshot
 
     def get_item_by_name(self, name: str) -> Optional[Tuple[str, Item]]:
-        item_id = self.item_name_to_id.get(name)
-        return (item_id, self.item_data[item_id]) if item_id and item_id in self.item_data else None
+        snapshot = self._snapshot
+        item_id = snapshot.item_name_to_id.get(name)
+        return (item_id, snapshot.item_data[item_id]) if item_id and item_id in snapshot.item_data else None
 
     def get_realm_by_name(self, name: str) -> Optional[Tuple[str, dict]]:
-        realm_id = self.realm_name_to_id.get(name)
-        return (realm_id, self.realm_data[realm_id]) if realm_id else None
+        snapshot = self._snapshot
+        realm_id = snapshot.realm_name_to_id.get(name)
+        return (realm_id, snapshot.realm_data[realm_id]) if realm_id else None
 
     def get_boss_by_name(self, name: str) -> Optional[Tuple[str, dict]]:
-        boss_id = self.boss_name_to_id.get(name)
-        return (boss_id, self.boss_data[boss_id]) if boss_id else None
\ No newline at end of file
+        snapshot = self._snapshot
+        boss_id = snapshot.boss_name_to_id.get(name)
+        return (boss_id, snapshot.boss_data[boss_id]) if boss_id else None
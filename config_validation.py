@@ -0,0 +1,149 @@
+# config_validation.py
+
+from numbers import Real
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from astrbot.api import logger
+
+TAG_MULTIPLIER_KEYS = ("hp_multiplier", "attack_multiplier", "defense_multiplier",
+                       "gold_multiplier", "exp_multiplier")
+
+class LootTable(NamedTuple):
+    """编译后的掉落表：以并列的元组保存每条掉落的概率、物品ID与数量范围"""
+
+    chances: Tuple[float, ...] = ()
+    item_ids: Tuple[str, ...] = ()
+    min_qty: Tuple[int, ...] = ()
+    max_qty: Tuple[int, ...] = ()
+
+    @classmethod
+    def merge(cls, tables: Iterable["LootTable"]) -> "LootTable":
+        chances, item_ids, min_qty, max_qty = [], [], [], []
+        for table in tables:
+            chances.extend(table.chances)
+            item_ids.extend(table.item_ids)
+            min_qty.extend(table.min_qty)
+            max_qty.extend(table.max_qty)
+        return cls(tuple(chances), tuple(item_ids), tuple(min_qty), tuple(max_qty))
+
+EMPTY_LOOT = LootTable()
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, Real) and not isinstance(value, bool)
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def compile_loot_table(entries: Any, source: str, errors: List[str]) -> LootTable:
+    """校验并编译一组掉落条目；不合法的条目记录错误后丢弃"""
+    if not isinstance(entries, list):
+        errors.append(f"{source}: add_to_loot 应为列表")
+        return EMPTY_LOOT
+
+    chances, item_ids, min_qty, max_qty = [], [], [], []
+    for i, entry in enumerate(entries):
+        where = f"{source}.add_to_loot[{i}]"
+        if not isinstance(entry, dict) or "item_id" not in entry:
+            errors.append(f"{where}: 缺少 item_id")
+            continue
+        chance = entry.get("chance", 0)
+        if not _is_number(chance) or not 0 <= chance <= 1:
+            errors.append(f"{where}: chance 应为 0 到 1 之间的数字，实际为 {chance!r}")
+            continue
+        quantity = entry.get("quantity", [1, 1])
+        if not isinstance(quantity, list) or not 1 <= len(quantity) <= 2 or not all(_is_int(q) for q in quantity):
+            errors.append(f"{where}: quantity 应为一到两个整数组成的列表，实际为 {quantity!r}")
+            continue
+        low = quantity[0]
+        high = quantity[1] if len(quantity) > 1 else low
+        if low < 0 or high < low:
+            errors.append(f"{where}: quantity 范围无效 {quantity!r}")
+            continue
+        chances.append(float(chance))
+        item_ids.append(str(entry["item_id"]))
+        min_qty.append(low)
+        max_qty.append(high)
+    return LootTable(tuple(chances), tuple(item_ids), tuple(min_qty), tuple(max_qty))
+
+def validate_tags(raw: Any, errors: List[str]) -> Tuple[Dict[str, dict], Dict[str, LootTable]]:
+    """校验 tags.json，返回清理后的标签数据与每个标签编译后的掉落表"""
+    if not isinstance(raw, dict):
+        errors.append("tags.json: 顶层应为对象")
+        return {}, {}
+
+    tags: Dict[str, dict] = {}
+    tag_loot: Dict[str, LootTable] = {}
+    for tag_name, effect in raw.items():
+        source = f"tags.json[{tag_name}]"
+        if not isinstance(effect, dict):
+            errors.append(f"{source}: 应为对象")
+            continue
+        effect = dict(effect)
+        for key in TAG_MULTIPLIER_KEYS:
+            if key in effect and not _is_number(effect[key]):
+                errors.append(f"{source}: {key} 应为数字，实际为 {effect[key]!r}，已按 1.0 处理")
+                del effect[key]
+        if "name_prefix" in effect and not isinstance(effect["name_prefix"], str):
+            errors.append(f"{source}: name_prefix 应为字符串")
+            del effect["name_prefix"]
+        tag_loot[tag_name] = compile_loot_table(effect["add_to_loot"], source, errors) \
+            if "add_to_loot" in effect else EMPTY_LOOT
+        tags[tag_name] = effect
+    return tags, tag_loot
+
+def validate_templates(raw: Any, file_name: str, tag_names: Set[str], errors: List[str],
+                       require_cooldown: bool = False) -> Dict[str, dict]:
+    """校验 monsters.json / bosses.json，丢弃无法用于生成的模板"""
+    if not isinstance(raw, dict):
+        errors.append(f"{file_name}: 顶层应为对象")
+        return {}
+
+    templates: Dict[str, dict] = {}
+    for template_id, template in raw.items():
+        source = f"{file_name}[{template_id}]"
+        if not isinstance(template, dict) or not isinstance(template.get("name"), str):
+            errors.append(f"{source}: 缺少 name，已忽略该模板")
+            continue
+        tags = template.get("tags", [])
+        if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+            errors.append(f"{source}: tags 应为字符串列表，已忽略该模板")
+            continue
+        unknown_tags = [t for t in tags if t not in tag_names]
+        if unknown_tags:
+            errors.append(f"{source}: 引用了不存在的标签 {unknown_tags}，这些标签不会生效")
+        if require_cooldown and not _is_int(template.get("cooldown_minutes")):
+            errors.append(f"{source}: cooldown_minutes 应为整数，已忽略该模板")
+            continue
+        templates[template_id] = template
+    return templates
+
+def validate_item(item_id: str, info: Any, errors: List[str]) -> Optional[dict]:
+    """校验 items.json 中单个物品的字段类型"""
+    source = f"items.json[{item_id}]"
+    if not isinstance(info, dict):
+        errors.append(f"{source}: 应为对象")
+        return None
+    if not _is_int(info.get("price")) or info["price"] < 0:
+        errors.append(f"{source}: price 应为非负整数，已忽略该物品")
+        return None
+    for key in ("effect", "equip_effects"):
+        if info.get(key) is not None and not isinstance(info[key], dict):
+            errors.append(f"{source}: {key} 应为对象，已忽略该物品")
+            return None
+    return info
+
+def check_loot_items(tag_loot: Dict[str, LootTable], item_ids: Set[str], errors: List[str]):
+    """掉落表中引用了 items.json 不存在的物品时，汇总为一条问题记录"""
+    unknown: Dict[str, List[str]] = {}
+    for tag_name, table in tag_loot.items():
+        for item_id in table.item_ids:
+            if item_id not in item_ids:
+                unknown.setdefault(item_id, []).append(tag_name)
+    if unknown:
+        details = "，".join(f"{item_id}（标签: {'/'.join(tags)}）" for item_id, tags in unknown.items())
+        errors.append(f"掉落表引用了未定义的物品: {details}")
+
+def report_errors(errors: Iterable[str]):
+    errors = list(errors)
+    if errors:
+        logger.warning(f"配置校验发现 {len(errors)} 处问题:\n" + "\n".join(f"  - {e}" for e in errors))
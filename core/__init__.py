@@ -4,5 +4,9 @@ from .combat_manager import BattleManager
 from .cultivation_manager import CultivationManager
 from .realm_manager import RealmManager
 from .sect_manager import SectManager
+from .world_boss_state import WorldBossState
+from .metrics import Metrics
+from .keyed_lock import KeyedLock
+from .boss_scheduler import BossScheduler
 
-__all__ = ["BattleManager", "CultivationManager", "RealmManager", "SectManager"]
\ No newline at end of file
+__all__ = ["BattleManager", "CultivationManager", "RealmManager", "SectManager", "WorldBossState", "Metrics", "KeyedLock", "BossScheduler"]
\ No newline at end of file
@@ -0,0 +1,187 @@
+# core/boss_scheduler.py
+
+import asyncio
+import heapq
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from astrbot.api import logger, AstrBotConfig
+from ..config_manager import ConfigManager
+from ..data import DataBase, Leaderboard
+from ..models import ActiveWorldBoss, Boss
+from .combat_manager import MonsterGenerator
+from .world_boss_state import WorldBossState
+
+SpawnCallback = Callable[[List[Tuple[ActiveWorldBoss, Boss]]], Awaitable[None]]
+
+class BossScheduler:
+    """世界Boss的刷新调度
+
+    记录每个Boss模板的下次刷新时间（击杀时间 + cooldown_minutes），只有到期时才计算
+    Boss等级并写库生成；各等级Boss的战斗属性作为派生数据随配置快照一起构建，
+    查看Boss列表与讨伐时都直接读取内存。
+
+    后台任务按最小堆中最早的刷新时间休眠，到点即刷新；刷新时间随击杀结算一并落库，
+    重启后冷却计时不会被重置。
+    """
+
+    # 堆为空时的最长休眠时间，用于发现配置重载后新增的Boss模板
+    IDLE_CHECK_INTERVAL = 60.0
+    # 到期却未能刷新（配置有误或写库失败）时的重试间隔
+    RETRY_INTERVAL = 30.0
+
+    def __init__(self, db: DataBase, boss_state: WorldBossState, config: AstrBotConfig,
+                 config_manager: ConfigManager, leaderboard: Leaderboard):
+        self.db = db
+        self.boss_state = boss_state
+        self.config = config
+        self.config_manager = config_manager
+        self.leaderboard = leaderboard
+        # boss_id -> 最早可以再次刷新的时间；没有记录的模板视为立即可刷新
+        self._next_spawn: Dict[str, float] = {}
+        # (刷新时间, boss_id) 的最小堆；与 _next_spawn 不一致的条目视为过期，弹出时丢弃
+        self._heap: List[Tuple[float, str]] = []
+        self._spawn_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._on_spawn: Optional[SpawnCallback] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def load(self):
+        """启动时从数据库恢复尚未到期的刷新时间，已过期的视为立即可刷新"""
+        now = time.time()
+        schedule = await self.db.get_boss_schedule()
+        self._next_spawn = {boss_id: at for boss_id, at in schedule.items() if at > now}
+        self._heap = [(at, boss_id) for boss_id, at in self._next_spawn.items()]
+        heapq.heapify(self._heap)
+        if self._next_spawn:
+            logger.info(f"已从数据库恢复 {len(self._next_spawn)} 个世界Boss的刷新时间。")
+
+    def start(self, on_spawn: Optional[SpawnCallback] = None):
+        """启动后台刷新任务；on_spawn 在每批Boss刷新后调用（如群内公告）"""
+        self._on_spawn = on_spawn
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            # 等正在进行的刷新写库完成后再取消，避免事务被中途打断
+            async with self._spawn_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _seconds_until_next(self, now: float) -> float:
+        if self.due_boss_ids(now):
+            return 0.0
+        while self._heap:
+            at, boss_id = self._heap[0]
+            if self._next_spawn.get(boss_id) == at and self.boss_state.get(boss_id) is None:
+                return at - now
+            heapq.heappop(self._heap)
+        return self.IDLE_CHECK_INTERVAL
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            delay = self._seconds_until_next(time.time())
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), min(delay, self.IDLE_CHECK_INTERVAL))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                spawned = await self.spawn_due()
+            except Exception:
+                # 任何异常都不能结束后台任务，否则重启前不会再刷新Boss；取消（CancelledError）不在此列
+                logger.exception("后台刷新世界Boss失败")
+                spawned = []
+            if spawned and self._on_spawn:
+                try:
+                    await self._on_spawn([
+                        (instance, self.get_stats(instance.boss_id, instance.level_index)) for instance in spawned
+                    ])
+                except Exception as e:
+                    logger.warning(f"世界Boss刷新公告发送失败: {e}")
+            if self.due_boss_ids():
+                await asyncio.sleep(self.RETRY_INTERVAL)
+
+    def _level_reference(self) -> int:
+        """排行榜前N名的平均境界，作为新刷新Boss的等级"""
+        top_players = self.leaderboard.top(self.config["VALUES"]["WORLD_BOSS_TOP_PLAYERS_AVG"])
+        return int(sum(p.level_index for p in top_players) / len(top_players)) if top_players else 1
+
+    def due_boss_ids(self, now: Optional[float] = None) -> List[str]:
+        now = time.time() if now is None else now
+        return [
+            boss_id for boss_id in self.config_manager.boss_data
+            if self.boss_state.get(boss_id) is None and self._next_spawn.get(boss_id, 0.0) <= now
+        ]
+
+    def next_spawns(self) -> List[Tuple[str, float]]:
+        """冷却中的Boss及其刷新时间，按时间先后排列"""
+        pending = [
+            (boss_id, at) for boss_id, at in self._next_spawn.items()
+            if boss_id in self.config_manager.boss_data and self.boss_state.get(boss_id) is None
+        ]
+        return sorted(pending, key=lambda item: item[1])
+
+    async def spawn_due(self, now: Optional[float] = None) -> List[ActiveWorldBoss]:
+        """刷新所有到期的Boss；没有到期的Boss时不访问数据库"""
+        if not self.due_boss_ids(now):
+            return []
+        async with self._spawn_lock:
+            return await self._spawn_due_locked(now)
+
+    async def _spawn_due_locked(self, now: Optional[float]) -> List[ActiveWorldBoss]:
+        due = self.due_boss_ids(now)
+        level_index = self._level_reference()
+        spawned = []
+        for boss_id in due:
+            stats = self.get_stats(boss_id, level_index)
+            if not stats:
+                logger.error(f"无法为Boss ID {boss_id} 生成属性，请检查配置。")
+                continue
+            logger.info(f"世界Boss {stats.name} (ID: {boss_id}) 刷新，等级 {level_index}。")
+            instance = ActiveWorldBoss(
+                boss_id=boss_id,
+                current_hp=stats.max_hp,
+                max_hp=stats.max_hp,
+                spawned_at=time.time(),
+                level_index=level_index
+            )
+            async with self.boss_state.lock(boss_id):
+                if self.boss_state.get(boss_id) is None:
+                    await self.boss_state.spawn(instance)
+                    spawned.append(instance)
+            self._next_spawn.pop(boss_id, None)
+        return spawned
+
+    def on_killed(self, boss: Boss, killed_at: Optional[float] = None) -> float:
+        """登记Boss的下次刷新时间并唤醒后台任务，返回该时间供结算时一并落库"""
+        killed_at = time.time() if killed_at is None else killed_at
+        next_spawn_at = killed_at + max(0, boss.cooldown_minutes) * 60
+        self._next_spawn[boss.id] = next_spawn_at
+        heapq.heappush(self._heap, (next_spawn_at, boss.id))
+        self._wakeup.set()
+        return next_spawn_at
+
+    def get_stats(self, boss_id: str, level_index: int) -> Optional[Boss]:
+        """Boss在指定等级下的属性；每次返回新对象，不会改动快照中的缓存"""
+        return MonsterGenerator.create_world_boss(boss_id, level_index, self.config_manager)
+
+    def active_bosses(self) -> List[Tuple[ActiveWorldBoss, Boss]]:
+        result = []
+        for instance in self.boss_state.all():
+            stats = self.get_stats(instance.boss_id, instance.level_index)
+            if stats:
+                result.append((instance, stats))
+        return result
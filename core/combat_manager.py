@@ -1,217 +1,318 @@
 # core/combat_manager.py
 
+import asyncio
 import random
-import time
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Set, Tuple, Any, NamedTuple, TYPE_CHECKING
 
+import aiosqlite
 from astrbot.api import logger, AstrBotConfig
 from ..models import Player, Boss, ActiveWorldBoss, Monster
 from ..data import DataBase
-from ..config_manager import ConfigManager
+from ..config_manager import ConfigManager, ConfigSnapshot
+from ..config_validation import LootTable
+from .world_boss_state import WorldBossState
+
+if TYPE_CHECKING:
+    from .boss_scheduler import BossScheduler
+
+class DuelOutcome(NamedTuple):
+    """回合制对战的结算结果"""
+
+    turns: int
+    first_hp: int  # 先手方剩余生命（未做保底处理）
+    second_hp: int  # 后手方剩余生命（未做保底处理）
+    damage_by_first: int
+    damage_by_second: int
+
+def resolve_duel(first_hp: int, first_damage: int, second_hp: int, second_damage: int,
+                 first_floor: int = 1, second_floor: int = 0,
+                 max_turns: Optional[int] = None, clamp_overkill: bool = False) -> DuelOutcome:
+    """以解析方式结算“先手攻击、后手反击”的回合制战斗，结果与逐回合模拟完全一致。
+
+    每回合先手造成 first_damage 点伤害，若后手生命降至 second_floor 及以下则战斗立即结束；
+    否则后手造成 second_damage 点伤害，先手生命降至 first_floor 及以下时战斗结束。
+    双方每回合伤害恒定（调用方保证 >= 1），因此各自的击杀所需回合数可直接求出。
+    clamp_overkill 为 True 时先手的总伤害不超过后手的剩余生命。
+    """
+    if first_hp <= first_floor or second_hp <= second_floor or (max_turns is not None and max_turns <= 0):
+        return DuelOutcome(0, first_hp, second_hp, 0, 0)
+
+    # 向上取整：把对方打到阈值及以下所需的命中次数
+    hits_to_defeat_second = -(-(second_hp - second_floor) // first_damage)
+    hits_to_defeat_first = -(-(first_hp - first_floor) // second_damage)
+
+    if hits_to_defeat_second <= hits_to_defeat_first:
+        # 先手在自己倒下前击败对手，对手少反击一次
+        turns, first_hits, second_hits = hits_to_defeat_second, hits_to_defeat_second, hits_to_defeat_second - 1
+    else:
+        turns, first_hits, second_hits = hits_to_defeat_first, hits_to_defeat_first, hits_to_defeat_first
+
+    if max_turns is not None and turns > max_turns:
+        turns, first_hits, second_hits = max_turns, max_turns, max_turns
+
+    damage_by_first = first_hits * first_damage
+    if clamp_overkill:
+        damage_by_first = min(damage_by_first, second_hp)
+    damage_by_second = second_hits * second_damage
+    return DuelOutcome(turns, first_hp - damage_by_second, second_hp - damage_by_first,
+                       damage_by_first, damage_by_second)
+
+class _StatTemplate(NamedTuple):
+    """怪物/Boss属性中与随机无关的部分"""
+
+    name: str
+    hp: int
+    attack: int
+    defense: int
+    gold: int
+    experience: int
+    loot_table: LootTable
+    cooldown_minutes: int = 0
+
+class _TemplateTable(NamedTuple):
+    """同一模板在各境界下的属性，数值按境界下标存放为列"""
+
+    name: str
+    loot_table: LootTable
+    cooldown_minutes: int
+    hp: Tuple[int, ...]
+    attack: Tuple[int, ...]
+    defense: Tuple[int, ...]
+    gold: Tuple[int, ...]
+    experience: Tuple[int, ...]
+
+    def at(self, level_index: int) -> _StatTemplate:
+        return _StatTemplate(self.name, self.hp[level_index], self.attack[level_index],
+                             self.defense[level_index], self.gold[level_index],
+                             self.experience[level_index], self.loot_table, self.cooldown_minutes)
 
 class MonsterGenerator:
-    """基于标签系统的怪物和Boss生成器"""
+    """基于标签系统的怪物和Boss生成器
+
+    名称、属性与合并后的掉落表只取决于 (模板, 境界, 强度系数) 与配置，
+    作为派生数据随配置快照一起构建；每次生成只重新掷掉落。
+    """
+
+    TEMPLATE_CACHE_KEY = "stat_templates"
+    WORLD_BOSS_CACHE_KEY = "world_boss_stats"
+
+    @classmethod
+    def build_template_cache(cls, snapshot: ConfigSnapshot,
+                             scaling_factors: Tuple[float, ...] = (1.0,)) -> Dict[tuple, _TemplateTable]:
+        """按 (类型, 模板ID, 强度系数) 为境界表中的每个等级预先计算属性"""
+        levels = range(max(1, len(snapshot.level_data)))
+        cache: Dict[tuple, _TemplateTable] = {}
+        for kind, templates, factors in (("monster", snapshot.monster_data, (1.0,)),
+                                         ("boss", snapshot.boss_data, scaling_factors)):
+            for template_id, template in templates.items():
+                for scaling_factor in factors:
+                    cache[(kind, template_id, scaling_factor)] = cls._build_table(
+                        kind, template, snapshot, scaling_factor, levels)
+        return cache
+
+    @classmethod
+    def build_world_boss_cache(cls, snapshot: ConfigSnapshot) -> Dict[Tuple[str, int], _StatTemplate]:
+        """按 (Boss ID, 境界) 预先计算世界Boss的战斗属性
+
+        世界Boss的奖励只有按伤害分配的灵石与修为，不掷物品掉落，同一等级的Boss可直接共用。
+        缓存的是不可变的属性元组，由 create_world_boss 每次生成新的 Boss 对象。
+        """
+        levels = range(max(1, len(snapshot.level_data)))
+        cache: Dict[Tuple[str, int], _StatTemplate] = {}
+        for boss_id, template in snapshot.boss_data.items():
+            table = cls._build_table("boss", template, snapshot, 1.0, levels)
+            for level_index in levels:
+                cache[(boss_id, level_index)] = table.at(level_index)
+        return cache
 
     @staticmethod
-    def _generate_rewards(base_loot: List) -> Dict[str, int]:
+    def _boss_from_stats(template_id: str, stats: _StatTemplate, items: Dict[str, int]) -> Boss:
+        return Boss(
+            id=template_id,
+            name=stats.name,
+            hp=stats.hp,
+            max_hp=stats.hp,
+            attack=stats.attack,
+            defense=stats.defense,
+            cooldown_minutes=stats.cooldown_minutes,
+            rewards={
+                "gold": stats.gold,
+                "experience": stats.experience,
+                "items": items
+            }
+        )
+
+    @staticmethod
+    def _generate_rewards(loot_table: LootTable) -> Dict[str, int]:
+        # 掉落表已在加载配置时校验并编译，这里只需逐条掷骰
         gained_items = {}
-        for entry in base_loot:
-            if random.random() < entry.get("chance", 0):
-                quantity_range = entry.get("quantity", [1, 1])
-                min_qty = quantity_range[0]
-                max_qty = quantity_range[1] if len(quantity_range) > 1 else min_qty
-
-                item_id = str(entry["item_id"])
-                amount = random.randint(min_qty, max_qty)
-                gained_items[item_id] = gained_items.get(item_id, 0) + amount
+        roll, randint = random.random, random.randint
+        for chance, item_id, min_qty, max_qty in zip(*loot_table):
+            if roll() < chance:
+                gained_items[item_id] = gained_items.get(item_id, 0) + randint(min_qty, max_qty)
         return gained_items
 
-    @classmethod
-    def create_monster(cls, template_id: str, player_level_index: int, config_manager: ConfigManager) -> Optional[Monster]:
-        template = config_manager.monster_data.get(template_id)
-        if not template:
-            logger.warning(f"尝试创建怪物失败：找不到模板ID {template_id}")
-            return None
-
-        base_hp = 15 * player_level_index + 60
-        base_attack = 2 * player_level_index + 8
-        base_defense = 1 * player_level_index + 4
-        base_gold = 3 * player_level_index + 10
-        base_exp = 5 * player_level_index + 20
+    @staticmethod
+    def _base_stats(kind: str, player_level_index: int) -> Tuple[int, int, int, int, int]:
+        if kind == "boss":
+            return (100 * player_level_index + 500, 10 * player_level_index + 40,
+                    5 * player_level_index + 20, 50 * player_level_index + 1000,
+                    100 * player_level_index + 2000)
+        return (15 * player_level_index + 60, 2 * player_level_index + 8,
+                1 * player_level_index + 4, 3 * player_level_index + 10,
+                5 * player_level_index + 20)
 
+    @classmethod
+    def _build_table(cls, kind: str, template: dict, snapshot: ConfigSnapshot,
+                     scaling_factor: float, levels: range) -> _TemplateTable:
         final_name = template["name"]
-        final_hp = base_hp
-        final_attack = base_attack
-        final_defense = base_defense
-        final_gold = base_gold
-        final_exp = base_exp
-        combined_loot_table = []
+        # 生命、攻击、防御、灵石、经验各自依次应用的倍率
+        multipliers = ([], [], [], [], [])
+        loot_tables = []
 
         for tag_name in template.get("tags", []):
-            tag_effect = config_manager.tag_data.get(tag_name)
+            tag_effect = snapshot.tag_data.get(tag_name)
             if not tag_effect:
                 continue
 
             if "name_prefix" in tag_effect:
                 final_name = f"【{tag_effect['name_prefix']}】{final_name}"
 
-            final_hp *= tag_effect.get("hp_multiplier", 1.0)
-            final_attack *= tag_effect.get("attack_multiplier", 1.0)
-            final_defense *= tag_effect.get("defense_multiplier", 1.0)
-            final_gold *= tag_effect.get("gold_multiplier", 1.0)
-            final_exp *= tag_effect.get("exp_multiplier", 1.0)
+            multipliers[0].append(tag_effect.get("hp_multiplier", 1.0))
+            multipliers[1].append(tag_effect.get("attack_multiplier", 1.0))
+            multipliers[2].append(tag_effect.get("defense_multiplier", 1.0))
+            multipliers[3].append(tag_effect.get("gold_multiplier", 1.0))
+            multipliers[4].append(tag_effect.get("exp_multiplier", 1.0))
+
+            loot_tables.append(snapshot.tag_loot[tag_name])
+
+        base_stats = [cls._base_stats(kind, level_index) for level_index in levels]
+        columns = []
+        for stat_index, factors in enumerate(multipliers):
+            column = []
+            for stats in base_stats:
+                # 按标签顺序逐个相乘，保证与逐标签计算的浮点结果一致
+                value = stats[stat_index]
+                for factor in factors:
+                    value *= factor
+                # 强度系数只作用于生命、攻击、防御
+                if stat_index < 3:
+                    value *= scaling_factor
+                column.append(int(value))
+            columns.append(tuple(column))
+
+        return _TemplateTable(final_name, LootTable.merge(loot_tables),
+                              template.get("cooldown_minutes", 0), *columns)
+
+    @classmethod
+    def _get_template(cls, kind: str, template_id: str, player_level_index: int,
+                      config_manager: ConfigManager, scaling_factor: float = 1.0) -> Optional[_StatTemplate]:
+        # 整个查找只使用同一个快照，重载发生在中途也不会混用新旧配置；快照的派生数据只在构建时写入
+        snapshot = config_manager.snapshot
+        table = snapshot.derived.get(cls.TEMPLATE_CACHE_KEY, {}).get((kind, template_id, scaling_factor))
+        if table is not None and 0 <= player_level_index < len(table.hp):
+            return table.at(player_level_index)
+
+        template = (snapshot.boss_data if kind == "boss" else snapshot.monster_data).get(template_id)
+        if not template:
+            return None
+        # 未注册的强度系数或超出境界表的等级：只计算这一级，不写入快照
+        return cls._build_table(kind, template, snapshot, scaling_factor,
+                                range(player_level_index, player_level_index + 1)).at(0)
 
-            if "add_to_loot" in tag_effect:
-                combined_loot_table.extend(tag_effect["add_to_loot"])
+    @classmethod
+    def create_monster(cls, template_id: str, player_level_index: int, config_manager: ConfigManager) -> Optional[Monster]:
+        stats = cls._get_template("monster", template_id, player_level_index, config_manager)
+        if not stats:
+            logger.warning(f"尝试创建怪物失败：找不到模板ID {template_id}")
+            return None
 
-        final_hp = int(final_hp)
         instance = Monster(
             id=template_id,
-            name=final_name,
-            hp=final_hp,
-            max_hp=final_hp,
-            attack=int(final_attack),
-            defense=int(final_defense),
+            name=stats.name,
+            hp=stats.hp,
+            max_hp=stats.hp,
+            attack=stats.attack,
+            defense=stats.defense,
             rewards={
-                "gold": int(final_gold),
-                "experience": int(final_exp),
-                "items": cls._generate_rewards(combined_loot_table)
+                "gold": stats.gold,
+                "experience": stats.experience,
+                "items": cls._generate_rewards(stats.loot_table)
             }
         )
         return instance
 
     @classmethod
     def create_boss(cls, template_id: str, player_level_index: int, config_manager: ConfigManager, scaling_factor: float = 1.0) -> Optional[Boss]:
-        template = config_manager.boss_data.get(template_id)
-        if not template:
+        stats = cls._get_template("boss", template_id, player_level_index, config_manager, scaling_factor)
+        if not stats:
             logger.warning(f"尝试创建Boss失败：找不到模板ID {template_id}")
             return None
+        return cls._boss_from_stats(template_id, stats, cls._generate_rewards(stats.loot_table))
 
-        base_hp = 100 * player_level_index + 500
-        base_attack = 10 * player_level_index + 40
-        base_defense = 5 * player_level_index + 20
-        base_gold = 50 * player_level_index + 1000
-        base_exp = 100 * player_level_index + 2000
-
-        final_name = template["name"]
-        final_hp = base_hp
-        final_attack = base_attack
-        final_defense = base_defense
-        final_gold = base_gold
-        final_exp = base_exp
-        combined_loot_table = []
-
-        for tag_name in template.get("tags", []):
-            tag_effect = config_manager.tag_data.get(tag_name, {})
-            if "name_prefix" in tag_effect:
-                final_name = f"【{tag_effect['name_prefix']}】{final_name}"
-            final_hp *= tag_effect.get("hp_multiplier", 1.0)
-            final_attack *= tag_effect.get("attack_multiplier", 1.0)
-            final_defense *= tag_effect.get("defense_multiplier", 1.0)
-            final_gold *= tag_effect.get("gold_multiplier", 1.0)
-            final_exp *= tag_effect.get("exp_multiplier", 1.0)
-            if "add_to_loot" in tag_effect:
-                combined_loot_table.extend(tag_effect["add_to_loot"])
-        
-        # 应用强度系数
-        final_hp *= scaling_factor
-        final_attack *= scaling_factor
-        final_defense *= scaling_factor
-
-        final_hp = int(final_hp)
-        instance = Boss(
-            id=template_id,
-            name=final_name,
-            hp=final_hp,
-            max_hp=final_hp,
-            attack=int(final_attack),
-            defense=int(final_defense),
-            cooldown_minutes=template["cooldown_minutes"],
-            rewards={
-                "gold": int(final_gold),
-                "experience": int(final_exp),
-                "items": cls._generate_rewards(combined_loot_table)
-            }
-        )
-        return instance
+    @classmethod
+    def create_world_boss(cls, boss_id: str, level_index: int, config_manager: ConfigManager) -> Optional[Boss]:
+        """世界Boss在指定等级下的属性，读取随配置快照构建的派生数据；返回的对象可由调用方随意修改"""
+        cache = config_manager.snapshot.derived.get(cls.WORLD_BOSS_CACHE_KEY, {})
+        stats = cache.get((boss_id, level_index))
+        if stats is None:
+            # 超出境界表的等级（或未注册派生数据）时现算，不做缓存
+            return cls.create_boss(boss_id, level_index, config_manager)
+        return cls._boss_from_stats(boss_id, stats, {})
 
 class BattleManager:
     """战斗管理器"""
     
-    def __init__(self, db: DataBase, config: AstrBotConfig, config_manager: ConfigManager):
+    def __init__(self, db: DataBase, config: AstrBotConfig, config_manager: ConfigManager,
+                 boss_state: Optional[WorldBossState] = None, boss_scheduler: Optional["BossScheduler"] = None):
         self.db = db
         self.config = config
         self.config_manager = config_manager
+        self.boss_state = boss_state
+        self.boss_scheduler = boss_scheduler
+        # 合击模式：窗口期内对同一Boss的讨伐排队，由一次结算统一处理并一次性提交
+        perf_config = self.config.get("PERFORMANCE", {})
+        self.raid_window = perf_config.get("WORLD_BOSS_RAID_WINDOW", 0.5) if perf_config.get("WORLD_BOSS_RAID_MODE", False) else 0
+        self._raid_queues: Dict[str, List[Tuple[Player, str, asyncio.Future]]] = {}
+        self._raid_tasks: Set[asyncio.Task] = set()
 
     async def ensure_bosses_are_spawned(self) -> List[Tuple[ActiveWorldBoss, Boss]]:
-        active_boss_instances = await self.db.get_active_bosses()
-        active_boss_map = {b.boss_id: b for b in active_boss_instances}
-        all_boss_templates = self.config_manager.boss_data
-
-        top_players = await self.db.get_top_players(self.config["VALUES"]["WORLD_BOSS_TOP_PLAYERS_AVG"])
-
-        for boss_id, template in all_boss_templates.items():
-            if boss_id not in active_boss_map:
-                logger.info(f"世界Boss {template['name']} (ID: {boss_id}) 当前未激活，开始生成...")
-
-                avg_level_index = int(sum(p.level_index for p in top_players) / len(top_players)) if top_players else 1
-
-                boss_with_stats = MonsterGenerator.create_boss(boss_id, avg_level_index, self.config_manager)
-                if not boss_with_stats:
-                    logger.error(f"无法为Boss ID {boss_id} 生成属性，请检查配置。")
-                    continue
-
-                new_boss_instance = ActiveWorldBoss(
-                    boss_id=boss_id,
-                    current_hp=boss_with_stats.max_hp,
-                    max_hp=boss_with_stats.max_hp,
-                    spawned_at=time.time(),
-                    level_index=avg_level_index
-                )
-                await self.db.create_active_boss(new_boss_instance)
-                active_boss_map[boss_id] = new_boss_instance
-
-        result = []
-        for boss_id, active_instance in active_boss_map.items():
-            boss_template = MonsterGenerator.create_boss(boss_id, active_instance.level_index, self.config_manager)
-            if boss_template:
-                result.append((active_instance, boss_template))
-        return result
+        # 后台任务运行时由其按时刷新，这里是纯内存读取；未启动时退回为查看时刷新到期的Boss
+        if not self.boss_scheduler.running:
+            await self.boss_scheduler.spawn_due()
+        return self.boss_scheduler.active_bosses()
 
     async def player_fight_boss(self, player: Player, boss_id: str, player_name: str) -> str:
-        active_boss_instance = next((b for b in await self.db.get_active_bosses() if b.boss_id == boss_id), None)
-        if not active_boss_instance or active_boss_instance.current_hp <= 0:
+        if self.raid_window > 0:
+            return await self._queue_raid_attack(player, boss_id, player_name)
+        # 同一Boss的讨伐串行执行：每次都基于最新血量结算，且击杀只会被判定一次
+        async with self.boss_state.lock(boss_id):
+            return await self._player_fight_boss_locked(player, boss_id, player_name)
+
+    def _boss_unavailable(self, boss_id: str) -> Optional[str]:
+        if not self.boss_state.is_alive(boss_id):
             return f"来晚了一步，ID为【{boss_id}】的Boss已被击败或已消失！"
+        return None
 
-        boss = MonsterGenerator.create_boss(boss_id, active_boss_instance.level_index, self.config_manager)
-        if not boss:
-            return "错误：无法加载Boss战斗数据！"
+    def _strike_boss(self, player: Player, boss: Boss, boss_id: str, player_name: str) -> Tuple[List[str], bool]:
+        """基于Boss当前血量结算一次讨伐（调用方须持有该Boss的锁）
 
+        修改 player.hp 并记入伤害账本，不写数据库；返回战报与是否由本次讨伐击杀。
+        """
+        active_boss_instance = self.boss_state.get(boss_id)
         p_clone = player.clone()
         p_stats = p_clone.get_combat_stats(self.config_manager) # 获取最终战斗属性
-        boss_hp = active_boss_instance.current_hp
-
-        total_damage_dealt = 0
-        total_damage_taken = 0
-        turn = 0
-        max_turns = 50
-
-        while p_clone.hp > 1 and boss_hp > 0 and turn < max_turns:
-            turn += 1
-            damage_to_boss = max(1, p_stats['attack'] - boss.defense)
-            damage_to_boss = min(damage_to_boss, boss_hp)
-            boss_hp -= damage_to_boss
-            total_damage_dealt += damage_to_boss
-
-            if boss_hp <= 0:
-                break
-
-            damage_to_player = max(1, boss.attack - p_stats['defense'])
-            p_clone.hp -= damage_to_player
-            total_damage_taken += damage_to_player
 
-        if p_clone.hp < 1:
-            p_clone.hp = 1
+        outcome = resolve_duel(
+            p_clone.hp, max(1, p_stats['attack'] - boss.defense),
+            active_boss_instance.current_hp, max(1, boss.attack - p_stats['defense']),
+            max_turns=50, clamp_overkill=True
+        )
+        boss_hp = outcome.second_hp
+        total_damage_dealt = outcome.damage_by_first
+        total_damage_taken = outcome.damage_by_second
+        turn = outcome.turns
+        p_clone.hp = max(1, outcome.first_hp)
 
         combat_summary = [f"你向【{boss.name}】发起了挑战！", "……激战过后……"]
         if p_clone.hp <= 1 and boss_hp > 0:
@@ -225,67 +326,150 @@ class BattleManager:
 
         final_report = ["\n".join(combat_summary)]
         player.hp = p_clone.hp
-        await self.db.update_player(player)
-        await self.db.update_active_boss_hp(boss_id, boss_hp)
+        killed = self.boss_state.apply_damage(boss_id, player.user_id, player_name, total_damage_dealt)
         if total_damage_dealt > 0:
-            await self.db.record_boss_damage(boss_id, player.user_id, player_name, total_damage_dealt)
             final_report.append(f"\n你本次共对Boss贡献了 {total_damage_dealt} 点伤害！")
+        return final_report, killed
+
+    async def _settle_kill(self, boss: Boss, boss_id: str) -> List[str]:
+        active_boss_instance = self.boss_state.get(boss_id)
+        # 击杀时立即落盘快照，再进行结算；快照失败不影响结算，奖励直接由内存账本计算
+        try:
+            await self.boss_state.persist()
+        except aiosqlite.Error:
+            pass
+        return [
+            f"\n**惊天动地！【{boss.name}】在众位道友的合力之下倒下了！**",
+            await self._end_battle(boss, active_boss_instance)
+        ]
+
+    async def _player_fight_boss_locked(self, player: Player, boss_id: str, player_name: str) -> str:
+        unavailable = self._boss_unavailable(boss_id)
+        if unavailable:
+            return unavailable
+        boss = self.boss_scheduler.get_stats(boss_id, self.boss_state.get(boss_id).level_index)
+        if not boss:
+            return "错误：无法加载Boss战斗数据！"
 
-        if boss_hp <= 0:
-            final_report.append(f"\n**惊天动地！【{boss.name}】在众位道友的合力之下倒下了！**")
-            final_report.append(await self._end_battle(boss, active_boss_instance))
-
+        final_report, killed = self._strike_boss(player, boss, boss_id, player_name)
+        await self.db.update_player(player)
+        if killed:
+            final_report.extend(await self._settle_kill(boss, boss_id))
         return "\n".join(final_report)
 
+    # --- 合击模式 ---
+
+    async def _queue_raid_attack(self, player: Player, boss_id: str, player_name: str) -> str:
+        future = asyncio.get_running_loop().create_future()
+        queue = self._raid_queues.get(boss_id)
+        if queue is None:
+            # 窗口内的第一次讨伐负责安排本轮结算
+            queue = self._raid_queues[boss_id] = []
+            task = asyncio.create_task(self._raid_tick(boss_id))
+            self._raid_tasks.add(task)
+            task.add_done_callback(self._raid_tasks.discard)
+        queue.append((player, player_name, future))
+        return await future
+
+    async def _raid_tick(self, boss_id: str):
+        await asyncio.sleep(self.raid_window)
+        attacks = self._raid_queues.pop(boss_id, [])
+        try:
+            async with self.boss_state.lock(boss_id):
+                reports = await self._resolve_raid_locked(boss_id, attacks)
+        except Exception as e:
+            logger.error(f"世界Boss {boss_id} 合击结算失败: {e}")
+            for _, _, future in attacks:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), report in zip(attacks, reports):
+            if not future.done():
+                future.set_result(report)
+
+    async def _resolve_raid_locked(self, boss_id: str, attacks: List[Tuple[Player, str, asyncio.Future]]) -> List[str]:
+        """按到达顺序依次结算本轮所有讨伐，玩家气血在一个事务内提交
+
+        结果与逐个串行讨伐完全相同：击杀归属于令Boss倒下的那次讨伐，其后到达的讨伐视为来晚一步。
+        """
+        unavailable = self._boss_unavailable(boss_id)
+        if unavailable:
+            return [unavailable] * len(attacks)
+        boss = self.boss_scheduler.get_stats(boss_id, self.boss_state.get(boss_id).level_index)
+        if not boss:
+            return ["错误：无法加载Boss战斗数据！"] * len(attacks)
+
+        reports: List[List[str]] = []
+        fought: List[Player] = []
+        killer_index = None
+        for player, player_name, _ in attacks:
+            if killer_index is not None:
+                reports.append([self._boss_unavailable(boss_id)])
+                continue
+            final_report, killed = self._strike_boss(player, boss, boss_id, player_name)
+            if len(attacks) > 1:
+                final_report.append(f"（本轮共 {len(attacks)} 位道友合击此Boss）")
+            fought.append(player)
+            reports.append(final_report)
+            if killed:
+                killer_index = len(reports) - 1
+
+        await self.db.update_players_in_transaction(fought)
+        if killer_index is not None:
+            reports[killer_index].extend(await self._settle_kill(boss, boss_id))
+        return ["\n".join(report) for report in reports]
+
+    async def drain_raids(self):
+        """等待已排队的合击结算完成（插件卸载前调用）"""
+        while self._raid_tasks:
+            await asyncio.gather(*list(self._raid_tasks), return_exceptions=True)
+
     async def _end_battle(self, boss_template: Boss, boss_instance: ActiveWorldBoss) -> str:
-        participants = await self.db.get_boss_participants(boss_instance.boss_id)
-        if not participants:
-            await self.db.clear_boss_data(boss_instance.boss_id)
-            return "但似乎无人对此Boss造成伤害，奖励无人获得。"
-        total_damage_dealt = sum(p['total_damage'] for p in participants) or 1
-        reward_report = ["\n--- 战利品结算 ---"]
-        updated_players = []
-        for p_data in participants:
-            player_obj = await self.db.get_player_by_id(p_data['user_id'])
-            if player_obj:
+        participants = self.boss_state.get_participants(boss_instance.boss_id)
+        next_spawn_at = self.boss_scheduler.on_killed(boss_template)
+        rewards = []
+        names = {}
+        if participants:
+            total_damage_dealt = sum(p['total_damage'] for p in participants) or 1
+            # 奖励直接由伤害账本计算，以增量形式与Boss清理在同一事务内写入，无需加载玩家
+            for p_data in participants:
                 damage_contribution = p_data['total_damage'] / total_damage_dealt
                 gold_reward = int(boss_template.rewards['gold'] * damage_contribution)
                 exp_reward = int(boss_template.rewards['experience'] * damage_contribution)
-                player_obj.gold += gold_reward
-                player_obj.experience += exp_reward
-                updated_players.append(player_obj)
-                reward_report.append(f"道友 {p_data['user_name']} 获得灵石 {gold_reward}，修为 {exp_reward}！")
-        if updated_players:
-            await self.db.update_players_in_transaction(updated_players)
-        await self.db.clear_boss_data(boss_instance.boss_id)
+                rewards.append((gold_reward, exp_reward, p_data['user_id']))
+                names[p_data['user_id']] = p_data['user_name']
+        try:
+            rewarded = await self.db.settle_boss_rewards(boss_instance.boss_id, rewards, next_spawn_at)
+        except aiosqlite.Error:
+            reward_report = ["\n天地灵气紊乱，战利品结算失败，请联系管理员。"]
+        else:
+            # 只列出实际到账的参与者，玩家数据已不存在的跳过
+            reward_report = ["\n--- 战利品结算 ---"] + [
+                f"道友 {names[user_id]} 获得灵石 {gold_reward}，修为 {exp_reward}！"
+                for gold_reward, exp_reward, user_id in rewards if user_id in rewarded
+            ]
+            if not participants:
+                reward_report = ["但似乎无人对此Boss造成伤害，奖励无人获得。"]
+        finally:
+            # 结算失败也要移出内存，使Boss照常冷却后重新刷新，而不是卡在“已击杀”状态；
+            # 库中残留的行会在重新刷新时被覆盖
+            self.boss_state.remove(boss_instance.boss_id)
         return "\n".join(reward_report)
 
     def player_vs_monster(self, player: Player, monster) -> Tuple[bool, List[str], Player]:
         p_clone = player.clone()
         p_stats = p_clone.get_combat_stats(self.config_manager) # 获取最终战斗属性
-        monster_hp = monster.hp
-
-        total_damage_dealt = 0
-        total_damage_taken = 0
-        turn = 0
-
-        while p_clone.hp > 1 and monster_hp > 0:
-            turn += 1
-            damage_to_monster = max(1, p_stats['attack'] - monster.defense)
-            monster_hp -= damage_to_monster
-            total_damage_dealt += damage_to_monster
 
-            if monster_hp <= 0:
-                break
-
-            damage_to_player = max(1, monster.attack - p_stats['defense'])
-            p_clone.hp -= damage_to_player
-            total_damage_taken += damage_to_player
-
-        if p_clone.hp < 1:
-            p_clone.hp = 1
+        outcome = resolve_duel(
+            p_clone.hp, max(1, p_stats['attack'] - monster.defense),
+            monster.hp, max(1, monster.attack - p_stats['defense'])
+        )
+        total_damage_dealt = outcome.damage_by_first
+        total_damage_taken = outcome.damage_by_second
+        turn = outcome.turns
+        p_clone.hp = max(1, outcome.first_hp)
 
-        victory = monster_hp <= 0
+        victory = outcome.second_hp <= 0
 
         combat_summary = [f"你遭遇了【{monster.name}】！", "……激战过后……"]
         if victory:
@@ -309,26 +493,17 @@ class BattleManager:
         p1_display = attacker_name or attacker.user_id[-4:]
         p2_display = defender_name or defender.user_id[-4:]
 
-        p1_damage_dealt = 0
-        p2_damage_dealt = 0
-        turn = 0
-        max_turns = 30
-
-        while p1.hp > 1 and p2.hp > 1 and turn < max_turns:
-            turn += 1
-            damage_to_p2 = max(1, p1_stats['attack'] - p2_stats['defense'])
-            p2.hp -= damage_to_p2
-            p1_damage_dealt += damage_to_p2
-            if p2.hp <= 1:
-                p2.hp = 1
-                break
-
-            damage_to_p1 = max(1, p2_stats['attack'] - p1_stats['defense'])
-            p1.hp -= damage_to_p1
-            p2_damage_dealt += damage_to_p1
-            if p1.hp <= 1:
-                p1.hp = 1
-                break
+        outcome = resolve_duel(
+            p1.hp, max(1, p1_stats['attack'] - p2_stats['defense']),
+            p2.hp, max(1, p2_stats['attack'] - p1_stats['defense']),
+            second_floor=1, max_turns=30
+        )
+        p1_damage_dealt = outcome.damage_by_first
+        p2_damage_dealt = outcome.damage_by_second
+        if outcome.turns > 0:
+            # 倒下的一方保留1点生命
+            p1.hp = max(1, outcome.first_hp)
+            p2.hp = max(1, outcome.second_hp)
 
         combat_summary = [f"⚔️【切磋】{p1_display} vs {p2_display}", "……一番激斗……"]
 
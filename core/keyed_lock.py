@@ -0,0 +1,54 @@
+# core/keyed_lock.py
+
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+class KeyedLock:
+    """按键（如 user_id）分配的 asyncio 锁
+
+    同一个键的协程依次执行，不同键之间完全并发。锁对象只被持有者和等待者引用，
+    空闲后由 WeakValueDictionary 自动回收，长期运行不会积累无用的锁。
+    """
+
+    def __init__(self):
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.acquisitions = 0
+        self.contended = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[None]:
+        # 局部变量 lock 在持有或等待期间保持强引用
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+
+        self.acquisitions += 1
+        if lock.locked():
+            self.contended += 1
+            start = time.perf_counter()
+            await lock.acquire()
+            waited = time.perf_counter() - start
+            self.total_wait += waited
+            if waited > self.max_wait:
+                self.max_wait = waited
+        else:
+            await lock.acquire()
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "active": len(self._locks),
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "wait_ms": round(self.total_wait * 1000, 1),
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
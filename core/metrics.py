@@ -0,0 +1,168 @@
+# core/metrics.py
+
+import asyncio
+import contextvars
+import inspect
+import time
+from collections import deque
+from functools import wraps
+from typing import Any, Deque, Dict, List, Optional
+
+from astrbot.api import logger
+
+# 当前正在执行的指令的统计项，数据库调用据此计入所属指令
+_current_command: contextvars.ContextVar[Optional["_Stat"]] = contextvars.ContextVar("xiuxian_command", default=None)
+
+class _Stat:
+    """单个指令或数据库方法的统计：累计值 + 最近 N 次耗时的环形缓冲"""
+
+    __slots__ = ("count", "total", "max", "queries", "samples")
+
+    def __init__(self, sample_size: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.queries = 0
+        self.samples: Deque[float] = deque(maxlen=sample_size)
+
+    def record(self, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.samples.append(elapsed)
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class Metrics:
+    """指令与数据库调用的耗时统计
+
+    未开启时指令装饰器只多一次属性判断，数据库方法不做任何包装。
+    """
+
+    def __init__(self, enabled: bool = False, sample_size: int = 512):
+        self.enabled = enabled
+        self._sample_size = max(1, sample_size)
+        self.commands: Dict[str, _Stat] = {}
+        self.db_calls: Dict[str, _Stat] = {}
+        self.started_at = time.time()
+        self._task: Optional[asyncio.Task] = None
+
+    def _stat(self, table: Dict[str, _Stat], name: str) -> _Stat:
+        stat = table.get(name)
+        if stat is None:
+            stat = table[name] = _Stat(self._sample_size)
+        return stat
+
+    def instrument_database(self, db: Any):
+        """在数据库实例上包装所有公开的异步方法（仅在开启时调用）"""
+        if not self.enabled:
+            return
+        for name, method in inspect.getmembers(db, inspect.iscoroutinefunction):
+            if not name.startswith("_"):
+                setattr(db, name, self._wrap_db_method(name, method))
+
+    def _wrap_db_method(self, name: str, method):
+        stat = self._stat(self.db_calls, name)
+
+        @wraps(method)
+        async def wrapper(*args, **kwargs):
+            command = _current_command.get()
+            if command is not None:
+                command.queries += 1
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                stat.record(time.perf_counter() - start)
+
+        return wrapper
+
+    # --- 报告 ---
+
+    @staticmethod
+    def _format_rows(table: Dict[str, _Stat], limit: int, with_queries: bool) -> List[str]:
+        rows = []
+        for name, stat in sorted(table.items(), key=lambda kv: kv[1].total, reverse=True)[:limit]:
+            if not stat.count:
+                continue
+            line = (f"{name}: {stat.count}次 累计{stat.total * 1000:.0f}ms "
+                    f"均{stat.total / stat.count * 1000:.1f} p50 {stat.percentile(0.5) * 1000:.1f} "
+                    f"p95 {stat.percentile(0.95) * 1000:.1f} p99 {stat.percentile(0.99) * 1000:.1f} "
+                    f"最大{stat.max * 1000:.1f}ms")
+            if with_queries:
+                line += f" 查询{stat.queries / stat.count:.1f}/次"
+            rows.append(line)
+        return rows
+
+    def summary(self, limit: int = 5) -> str:
+        minutes = (time.time() - self.started_at) / 60
+        lines = [f"--- 指令耗时 Top{limit}（近 {minutes:.0f} 分钟）---"]
+        lines.extend(self._format_rows(self.commands, limit, with_queries=True) or ["(暂无数据)"])
+        lines.append(f"--- 数据库调用 Top{limit} ---")
+        lines.extend(self._format_rows(self.db_calls, limit, with_queries=False) or ["(暂无数据)"])
+        return "\n".join(lines)
+
+    def start_logging(self, interval: float):
+        """每隔 interval 秒把统计摘要写入日志；interval<=0 表示不输出"""
+        if self.enabled and interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._log_loop(interval))
+
+    async def stop_logging(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _log_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            if self.commands or self.db_calls:
+                logger.info("【修仙插件】性能统计\n" + self.summary())
+
+def timed_command(name: str):
+    """指令处理函数的计时装饰器，从 self.metrics 读取统计对象
+
+    只统计处理函数自身的执行时间，不包括框架发送每条回复所花的时间。
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            metrics: Metrics = self.metrics
+            if not metrics.enabled:
+                async for result in func(self, *args, **kwargs):
+                    yield result
+                return
+
+            stat = metrics._stat(metrics.commands, name)
+            token = _current_command.set(stat)
+            agen = func(self, *args, **kwargs)
+            elapsed = 0.0
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        result = await agen.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    yield result
+            finally:
+                await agen.aclose()
+                stat.record(elapsed)
+                try:
+                    _current_command.reset(token)
+                except ValueError:
+                    # 生成器在其他上下文中被关闭
+                    _current_command.set(None)
+
+        return wrapper
+    return decorator
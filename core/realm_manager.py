@@ -1,23 +1,77 @@
 # core/realm_manager.py
+import json
 import random
 import time
+import zlib
 from typing import Tuple, Dict, Any, List, Optional
 
 from astrbot.api import logger, AstrBotConfig
 from ..models import Player, FloorEvent, RealmInstance
+from ..realm_codec import RealmHeader, encode_seeded_realm
 from ..config_manager import ConfigManager
 from ..data import DataBase
 from .combat_manager import BattleManager, MonsterGenerator
 
 class RealmGenerator:
     """秘境生成器"""
-    
+
+    # (配置对象, 配置版本, 遇怪概率) -> 配置指纹
+    _fingerprint_cache: Tuple[Optional[tuple], int] = (None, 0)
+
+    @staticmethod
+    def _total_floors(level_index: int, config: AstrBotConfig) -> int:
+        return config["REALM_RULES"]["REALM_BASE_FLOORS"] + \
+               (level_index // config["REALM_RULES"]["REALM_FLOORS_PER_LEVEL_DIVISOR"])
+
+    @classmethod
+    def config_fingerprint(cls, config: AstrBotConfig, config_manager: ConfigManager) -> int:
+        """种子秘境所依赖配置（怪物池、Boss池及其顺序、遇怪概率）的指纹"""
+        chance = config["REALM_RULES"]["REALM_MONSTER_CHANCE"]
+        key = (id(config_manager), config_manager.version, chance)
+        cached_key, cached_value = cls._fingerprint_cache
+        if cached_key == key:
+            return cached_value
+        payload = json.dumps([list(config_manager.monster_data.keys()),
+                              list(config_manager.boss_data.keys()), chance], ensure_ascii=False)
+        fingerprint = zlib.crc32(payload.encode("utf-8"))
+        cls._fingerprint_cache = (key, fingerprint)
+        return fingerprint
+
+    @staticmethod
+    def generate_seeded_for_player(player: Player, config: AstrBotConfig, config_manager: ConfigManager) -> Optional[RealmHeader]:
+        """生成只记录种子的秘境，楼层在探索时由 derive_floor 推导"""
+        if not config_manager.monster_data or not config_manager.boss_data:
+            logger.error("秘境生成失败：怪物池或Boss池为空，请检查 monsters.json 和 bosses.json。")
+            return None
+
+        return RealmHeader(
+            id=f"dynamic_{player.level_index}_{int(time.time())}",
+            total_floors=RealmGenerator._total_floors(player.level_index, config),
+            floor_count=0,
+            seed=random.getrandbits(48),
+            level_index=player.level_index,
+            fingerprint=RealmGenerator.config_fingerprint(config, config_manager)
+        )
+
+    @staticmethod
+    def derive_floor(header: RealmHeader, index: int, config: AstrBotConfig, config_manager: ConfigManager) -> Optional[FloorEvent]:
+        """由种子推导第 index 层事件；每层使用独立的随机流，可单独推导任意一层"""
+        if not (0 <= index < header.total_floors):
+            return None
+        rng = random.Random((header.seed << 16) | index)
+
+        if index == header.total_floors - 1:
+            return FloorEvent(type="boss", data={"id": rng.choice(list(config_manager.boss_data.keys()))})
+        if rng.random() < config["REALM_RULES"]["REALM_MONSTER_CHANCE"]:
+            return FloorEvent(type="monster", data={"id": rng.choice(list(config_manager.monster_data.keys()))})
+        gold_reward = rng.randint(50, 150) * (1 + header.level_index)
+        return FloorEvent(type="treasure", data={"rewards": {"gold": int(gold_reward)}})
+
     @staticmethod
     def generate_for_player(player: Player, config: AstrBotConfig, config_manager: ConfigManager) -> Optional[RealmInstance]:
         level_index = player.level_index
 
-        total_floors = config["REALM_RULES"]["REALM_BASE_FLOORS"] + \
-                       (level_index // config["REALM_RULES"]["REALM_FLOORS_PER_LEVEL_DIVISOR"])
+        total_floors = RealmGenerator._total_floors(level_index, config)
 
         monster_pool = list(config_manager.monster_data.keys())
         boss_pool = list(config_manager.boss_data.keys())
@@ -54,26 +108,37 @@ class RealmManager:
         self.config_manager = config_manager
         self.battle_logic = BattleManager(db, config, config_manager)
 
+    @staticmethod
+    def _entry_cost(level_index: int) -> int:
+        return 50 + (level_index * 25)
+
     async def start_session(self, player: Player, cmd_realm_advance: str) -> Tuple[bool, str, Player]:
         p = player.clone()
         if p.realm_id is not None:
-             current_realm_instance = p.get_realm_instance()
-             current_realm_name = f"{p.get_level(self.config_manager)}修士的试炼" if current_realm_instance else "未知的秘境"
+             current_realm_header = p.get_realm_header()
+             current_realm_name = f"{p.get_level(self.config_manager)}修士的试炼" if current_realm_header else "未知的秘境"
              return False, f"你已身在【{current_realm_name}】之中，无法分心他顾。", p
 
-        cost = 50 + (p.level_index * 25)
+        cost = self._entry_cost(p.level_index)
 
         if p.gold < cost:
             return False, f"本次历练需要 {cost} 灵石作为盘缠，你的灵石不足。", p
 
-        realm_instance = RealmGenerator.generate_for_player(p, self.config, self.config_manager)
+        if self.config["REALM_RULES"].get("REALM_SEEDED_MODE", False):
+            realm_instance = RealmGenerator.generate_seeded_for_player(p, self.config, self.config_manager)
+        else:
+            realm_instance = RealmGenerator.generate_for_player(p, self.config, self.config_manager)
         if not realm_instance:
              return False, "天机混乱，秘境生成失败，请稍后再试。", p
 
         p.gold -= cost
         p.realm_id = realm_instance.id
         p.realm_floor = 0
-        p.set_realm_instance(realm_instance)
+        if isinstance(realm_instance, RealmHeader):
+            p.realm_data = encode_seeded_realm(realm_instance.id, realm_instance.seed, realm_instance.level_index,
+                                               realm_instance.fingerprint, realm_instance.total_floors)
+        else:
+            p.set_realm_instance(realm_instance)
 
         realm_name = f"{p.get_level(self.config_manager)}修士的试炼"
 
@@ -84,22 +149,35 @@ class RealmManager:
 
     async def advance_session(self, player: Player) -> Tuple[bool, str, Player, Dict[str, int]]:
         p = player.clone()
-        realm_instance = p.get_realm_instance()
+        # 只读取头部与当前层，其余楼层保持编码状态
+        realm_header = p.get_realm_header()
 
-        if not p.realm_id or not realm_instance:
+        if not p.realm_id or not realm_header:
             return False, "你不在任何秘境中。", p, {}
 
         p.realm_floor += 1
         current_floor_index = p.realm_floor - 1
 
-        if not (0 <= current_floor_index < len(realm_instance.floors)):
+        if realm_header.seed is not None:
+            if realm_header.fingerprint != RealmGenerator.config_fingerprint(self.config, self.config_manager):
+                # 怪物池或规则已变更，无法还原原有秘境，直接结束而不是生成另一座秘境；
+                # 崩塌并非玩家之过，按进入时的境界退还盘缠
+                refund = self._entry_cost(realm_header.level_index)
+                p.gold += refund
+                p.realm_id = None
+                p.realm_floor = 0
+                p.set_realm_instance(None)
+                return False, f"天地法则已然改易，秘境随之崩塌，你被传送了出来。\n退还盘缠 {refund} 灵石。", p, {}
+            event = RealmGenerator.derive_floor(realm_header, current_floor_index, self.config, self.config_manager)
+        else:
+            event = p.get_realm_floor(current_floor_index)
+        if event is None:
             p.realm_id = None
             p.realm_floor = 0
             p.set_realm_instance(None)
             return False, "秘境探索数据异常，已将你传送出来。", p, {}
 
-        event = realm_instance.floors[current_floor_index]
-        event_log = [f"--- 第 {p.realm_floor}/{realm_instance.total_floors} 层 ---"]
+        event_log = [f"--- 第 {p.realm_floor}/{realm_header.total_floors} 层 ---"]
 
         gained_items = {}
         victory = True
@@ -119,7 +197,7 @@ class RealmManager:
         else:
             event_log.append("此地异常安静，你谨慎地探索着，未发生任何事。")
 
-        if victory and p.realm_id is not None and p.realm_floor >= realm_instance.total_floors:
+        if victory and p.realm_id is not None and p.realm_floor >= realm_header.total_floors:
             realm_name = f"{p.get_level(self.config_manager)}修士的试炼"
             event_log.append(f"\n你成功探索完了【{realm_name}】的所有区域！")
             p.realm_id = None
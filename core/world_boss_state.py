@@ -0,0 +1,176 @@
+# core/world_boss_state.py
+
+import asyncio
+from typing import Dict, List, Optional, Set, Any, Tuple
+
+import aiosqlite
+from astrbot.api import logger
+from ..models import ActiveWorldBoss
+from ..data import DataBase
+
+class WorldBossState:
+    """世界Boss的内存状态
+
+    持有每个活跃Boss的当前血量与伤害账本，每个Boss一把 asyncio 锁。
+    战斗只修改内存，快照按周期（以及击杀时）在一个事务内落盘。
+    每个Boss另外维护伤害前 DAMAGE_TOP_K 名，查看Boss列表时无需对整个账本排序。
+    """
+
+    DAMAGE_TOP_K = 3
+
+    def __init__(self, db: DataBase, persist_interval: float = 5.0):
+        self.db = db
+        self._persist_interval = persist_interval
+        self._bosses: Dict[str, ActiveWorldBoss] = {}
+        # boss_id -> user_id -> {"user_id", "user_name", "total_damage"}
+        self._damage: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # boss_id -> 伤害最高的至多 DAMAGE_TOP_K 个账本条目（与 _damage 共享同一字典），按伤害倒序
+        self._top_damage: Dict[str, List[Dict[str, Any]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._dirty_hp: Set[str] = set()
+        self._dirty_damage: Dict[str, Set[str]] = {}
+        # 已判定击杀的Boss，保证结算只执行一次；重新生成时清除
+        self._killed: Set[str] = set()
+        self._persist_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def load(self):
+        """启动时从数据库恢复活跃Boss及其伤害账本"""
+        bosses = await self.db.get_active_bosses()
+        # 血量归零却未结算的Boss（结算失败或结算前退出）不再恢复，由调度器按冷却重新刷新
+        stale = [b.boss_id for b in bosses if b.current_hp <= 0]
+        if stale:
+            logger.warning(f"以下世界Boss已被击杀但未完成结算，将重新刷新: {', '.join(stale)}")
+        self._bosses = {b.boss_id: b for b in bosses if b.current_hp > 0}
+        self._damage = {}
+        self._top_damage = {}
+        for boss_id in self._bosses:
+            # 查询已按伤害倒序（由 idx_boss_participants_damage 提供顺序），前K行即伤害榜
+            participants = await self.db.get_boss_participants(boss_id)
+            ledger = self._damage[boss_id] = {p["user_id"]: dict(p) for p in participants}
+            self._top_damage[boss_id] = [ledger[p["user_id"]] for p in participants[:self.DAMAGE_TOP_K]]
+        logger.info(f"已从数据库恢复 {len(self._bosses)} 个活跃世界Boss。")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._persist_loop())
+
+    async def stop(self):
+        if self._task:
+            # 等正在进行的快照写入完成后再取消，避免事务被中途打断
+            async with self._persist_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.persist()
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(self._persist_interval)
+            try:
+                await self.persist()
+            except aiosqlite.Error:
+                # 失败的改动已重新标记为脏，下一轮重试
+                pass
+
+    def lock(self, boss_id: str) -> asyncio.Lock:
+        lock = self._locks.get(boss_id)
+        if lock is None:
+            lock = self._locks[boss_id] = asyncio.Lock()
+        return lock
+
+    def get(self, boss_id: str) -> Optional[ActiveWorldBoss]:
+        return self._bosses.get(boss_id)
+
+    def all(self) -> List[ActiveWorldBoss]:
+        return list(self._bosses.values())
+
+    def is_alive(self, boss_id: str) -> bool:
+        boss = self._bosses.get(boss_id)
+        return boss is not None and boss.current_hp > 0 and boss_id not in self._killed
+
+    async def spawn(self, boss: ActiveWorldBoss):
+        await self.db.create_active_boss(boss)
+        self._bosses[boss.boss_id] = boss
+        self._damage[boss.boss_id] = {}
+        self._top_damage[boss.boss_id] = []
+        self._killed.discard(boss.boss_id)
+
+    def apply_damage(self, boss_id: str, user_id: str, user_name: str, damage: int) -> bool:
+        """记录一次伤害并扣减血量（调用方须持有该Boss的锁）。
+
+        仅当本次伤害令Boss倒下且此前未被判定击杀时返回 True。
+        """
+        boss = self._bosses[boss_id]
+        damage = min(damage, boss.current_hp)
+        if damage > 0:
+            boss.current_hp -= damage
+            self._dirty_hp.add(boss_id)
+            ledger = self._damage.setdefault(boss_id, {})
+            entry = ledger.get(user_id)
+            if entry is None:
+                entry = ledger[user_id] = {"user_id": user_id, "user_name": user_name, "total_damage": 0}
+            entry["user_name"] = user_name
+            entry["total_damage"] += damage
+            self._dirty_damage.setdefault(boss_id, set()).add(user_id)
+            self._update_top_damage(boss_id, entry)
+
+        if boss.current_hp <= 0 and boss_id not in self._killed:
+            self._killed.add(boss_id)
+            return True
+        return False
+
+    def _update_top_damage(self, boss_id: str, entry: Dict[str, Any]):
+        # 累计伤害只增不减：榜外条目只有超过榜尾时才需要入榜
+        top = self._top_damage.setdefault(boss_id, [])
+        if not any(e is entry for e in top):
+            if len(top) >= self.DAMAGE_TOP_K and entry["total_damage"] <= top[-1]["total_damage"]:
+                return
+            top.append(entry)
+        top.sort(key=lambda e: e["total_damage"], reverse=True)
+        del top[self.DAMAGE_TOP_K:]
+
+    def get_participants(self, boss_id: str) -> List[Dict[str, Any]]:
+        ledger = self._damage.get(boss_id, {})
+        return sorted((dict(e) for e in ledger.values()), key=lambda e: e["total_damage"], reverse=True)
+
+    def top_participants(self, boss_id: str) -> List[Dict[str, Any]]:
+        """伤害前 DAMAGE_TOP_K 名，直接读取维护好的榜单"""
+        return [dict(e) for e in self._top_damage.get(boss_id, ())]
+
+    def remove(self, boss_id: str):
+        """结算完成（或结算失败）后从内存移除Boss；数据库侧由 settle_boss_rewards 在结算事务内清理"""
+        self._bosses.pop(boss_id, None)
+        self._damage.pop(boss_id, None)
+        self._top_damage.pop(boss_id, None)
+        self._dirty_hp.discard(boss_id)
+        self._dirty_damage.pop(boss_id, None)
+
+    async def persist(self):
+        """将所有脏的血量与伤害记录在一个事务内写入数据库"""
+        async with self._persist_lock:
+            if not self._dirty_hp and not self._dirty_damage:
+                return
+            dirty_hp, self._dirty_hp = self._dirty_hp, set()
+            dirty_damage, self._dirty_damage = self._dirty_damage, {}
+
+            hp_rows: List[Tuple[int, str]] = [
+                (self._bosses[b].current_hp, b) for b in dirty_hp if b in self._bosses
+            ]
+            damage_rows: List[Tuple[str, str, str, int]] = []
+            for boss_id, user_ids in dirty_damage.items():
+                ledger = self._damage.get(boss_id, {})
+                for user_id in user_ids:
+                    entry = ledger.get(user_id)
+                    if entry:
+                        damage_rows.append((boss_id, user_id, entry["user_name"], entry["total_damage"]))
+            try:
+                await self.db.save_boss_snapshot(hp_rows, damage_rows)
+            except aiosqlite.Error:
+                self._dirty_hp |= dirty_hp
+                for boss_id, user_ids in dirty_damage.items():
+                    self._dirty_damage.setdefault(boss_id, set()).update(user_ids)
+                raise
@@ -2,5 +2,6 @@
 
 from .data_manager import DataBase
 from .migration import MigrationManager
+from .leaderboard import Leaderboard
 
-__all__ = ["DataBase", "MigrationManager"]
\ No newline at end of file
+__all__ = ["DataBase", "MigrationManager", "Leaderboard"]
\ No newline at end of file
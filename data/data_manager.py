@@ -1,135 +1,644 @@
 # data/data_manager.py
 
+import asyncio
 import aiosqlite
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Set, Tuple, Iterable, AsyncIterator
 from dataclasses import fields
 
-from astrbot.api import logger
+from astrbot.api import logger, AstrBotConfig
 from astrbot.api.star import StarTools
 
 from ..config_manager import ConfigManager
-from ..models import Player, PlayerEffect, ActiveWorldBoss
+from ..models import Player, PlayerEffect, ActiveWorldBoss, PLAYER_COLUMNS
+from .leaderboard import Leaderboard
+
+# PRAGMA 不支持参数绑定，枚举型取值必须先经过白名单校验
+_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+_SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+_TEMP_STORES = {"DEFAULT", "FILE", "MEMORY"}
+
+# 启动自检的热点查询：若查询计划退化为全表扫描或临时排序则发出警告
+_HOT_QUERIES: Dict[str, Tuple[str, tuple]] = {
+    "排行榜": ("SELECT * FROM players ORDER BY level_index DESC, experience DESC LIMIT ?", (10,)),
+    "宗门成员": ("SELECT * FROM players WHERE sect_id = ?", (1,)),
+    "秘境中的玩家": ("SELECT user_id FROM players WHERE realm_id IS NOT NULL", ()),
+    "世界Boss伤害榜": (
+        "SELECT user_id, user_name, total_damage FROM world_boss_participants WHERE boss_id = ? ORDER BY total_damage DESC",
+        ("1",)
+    ),
+}
 
 class DataBase:
     """数据库管理器，封装所有数据库操作"""
-    
-    def __init__(self, db_file_name: str):
+
+    def __init__(self, db_file_name: str, config: Optional[AstrBotConfig] = None):
         data_dir = StarTools.get_data_dir("xiuxian")
         data_dir.mkdir(parents=True, exist_ok=True)
         self.db_path = data_dir / db_file_name
+        # conn 是唯一的写连接；纯读查询在 WAL 模式下走只读连接池，读写互不排队
         self.conn: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._reader_queue: Optional[asyncio.Queue] = None
+        # 按列集合缓存的 UPDATE 语句，update_player 只写入发生变化的列
+        self._update_sql_cache: Dict[Tuple[str, ...], str] = {}
+        # 共享连接上的写操作（尤其是显式事务）必须串行，避免事务相互嵌套
+        self._write_lock = asyncio.Lock()
+
+        perf_config = (config or {}).get("PERFORMANCE", {})
+        # 玩家对象的 LRU 缓存，所有写路径负责保持其与数据库一致
+        self._player_cache: "OrderedDict[str, Player]" = OrderedDict()
+        self._player_cache_capacity = max(0, int(perf_config.get("PLAYER_CACHE_SIZE", 1024)))
+        # 每次写路径修改缓存时递增，用于丢弃在写入期间读到的旧行
+        self._player_cache_epoch = 0
+        self.player_cache_hits = 0
+        self.player_cache_misses = 0
+        # 按 (境界, 修为) 排序的内存排行榜，与缓存一样由写路径增量维护
+        self.leaderboard = Leaderboard()
+
+        # 延迟写入（write-behind）：update_player 只登记脏玩家，由定时任务或数量阈值批量提交
+        self._read_pool_size = max(0, int(perf_config.get("READ_POOL_SIZE", 2)))
+        self._write_behind_enabled = bool(perf_config.get("WRITE_BEHIND_ENABLED", False))
+        self._write_behind_interval = max(0.1, float(perf_config.get("WRITE_BEHIND_FLUSH_INTERVAL", 2.0)))
+        self._write_behind_max_pending = max(1, int(perf_config.get("WRITE_BEHIND_MAX_PENDING", 200)))
+        self._pending_players: Dict[str, Player] = {}
+        # 已从待写队列取出、正在提交的玩家；提交成功前读路径仍需叠加这些修改（仅在持有 _flush_lock 时修改）
+        self._flushing_players: Dict[str, Player] = {}
+        self._flush_lock = asyncio.Lock()
+        self.write_behind_flushes = 0
+        self.write_behind_rows = 0
+
+        self._storage_profile = self._build_storage_profile((config or {}).get("STORAGE", {}))
+        self._background_tasks: List[asyncio.Task] = []
+
+    @staticmethod
+    def _build_storage_profile(storage_config: Dict[str, Any]) -> Dict[str, Any]:
+        def pick(key: str, default: str, allowed: set) -> str:
+            value = str(storage_config.get(key, default)).upper()
+            if value not in allowed:
+                logger.warning(f"存储配置 {key}={value} 无效，将使用默认值 {default}。")
+                return default
+            return value
+
+        return {
+            "journal_mode": pick("JOURNAL_MODE", "WAL", _JOURNAL_MODES),
+            "synchronous": pick("SYNCHRONOUS", "NORMAL", _SYNCHRONOUS_LEVELS),
+            "temp_store": pick("TEMP_STORE", "MEMORY", _TEMP_STORES),
+            "mmap_size": max(0, int(storage_config.get("MMAP_SIZE", 134217728))),
+            "cache_size": int(storage_config.get("CACHE_SIZE", -16000)),
+            "busy_timeout": max(0, int(storage_config.get("BUSY_TIMEOUT_MS", 5000))),
+            "checkpoint_interval": max(0, int(storage_config.get("WAL_CHECKPOINT_INTERVAL", 300))),
+        }
+
+    async def _apply_storage_profile(self, conn: aiosqlite.Connection, read_only: bool = False):
+        """在每个新建的连接上应用存储性能配置"""
+        profile = self._storage_profile
+        await conn.execute(f"PRAGMA busy_timeout = {profile['busy_timeout']}")
+        if not read_only:
+            # 日志模式是数据库文件级别的设置，只能由写连接修改
+            await conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+            await conn.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+        await conn.execute(f"PRAGMA temp_store = {profile['temp_store']}")
+        await conn.execute(f"PRAGMA mmap_size = {profile['mmap_size']}")
+        await conn.execute(f"PRAGMA cache_size = {profile['cache_size']}")
+
+    async def _read_effective_pragmas(self, conn: aiosqlite.Connection) -> Dict[str, Any]:
+        effective = {}
+        for pragma in ("journal_mode", "synchronous", "temp_store", "mmap_size", "cache_size", "busy_timeout"):
+            async with conn.execute(f"PRAGMA {pragma}") as cursor:
+                row = await cursor.fetchone()
+                effective[pragma] = row[0] if row else None
+        return effective
 
     async def connect(self):
         if self.conn is None:
             self.conn = await aiosqlite.connect(self.db_path)
             self.conn.row_factory = aiosqlite.Row
+            await self._apply_storage_profile(self.conn)
+            effective = await self._read_effective_pragmas(self.conn)
             logger.info(f"数据库连接已创建: {self.db_path}")
+            logger.info("数据库存储配置生效值: " + ", ".join(f"{k}={v}" for k, v in effective.items()))
+
+            if self._write_behind_enabled:
+                self._background_tasks.append(asyncio.create_task(self._write_behind_loop()))
+                logger.info(f"玩家数据延迟写入已开启：每 {self._write_behind_interval} 秒或累计 "
+                            f"{self._write_behind_max_pending} 名玩家提交一次。")
+            is_wal = str(effective.get("journal_mode", "")).upper() == "WAL"
+            if is_wal and self._storage_profile["checkpoint_interval"] > 0:
+                self._background_tasks.append(asyncio.create_task(self._wal_checkpoint_loop()))
+            if is_wal and self._read_pool_size > 0:
+                await self._open_read_pool()
+
+    async def _open_read_pool(self):
+        # 只读连接仅在 WAL 模式下启用：回滚日志模式中读连接会阻塞写连接提交
+        uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+        self._reader_queue = asyncio.Queue()
+        for _ in range(self._read_pool_size):
+            reader = await aiosqlite.connect(uri, uri=True)
+            reader.row_factory = aiosqlite.Row
+            await self._apply_storage_profile(reader, read_only=True)
+            self._readers.append(reader)
+            self._reader_queue.put_nowait(reader)
+        logger.info(f"数据库只读连接池已创建，共 {self._read_pool_size} 个连接。")
+
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """借出一个只读连接；未启用连接池时退回写连接"""
+        if self._reader_queue is None:
+            yield self.conn
+            return
+        reader = await self._reader_queue.get()
+        try:
+            yield reader
+        finally:
+            self._reader_queue.put_nowait(reader)
 
     async def close(self):
+        # 等进行中的批量写入和检查点结束后再取消后台任务，避免事务被中途打断
+        async with self._flush_lock:
+            async with self._write_lock:
+                for task in self._background_tasks:
+                    task.cancel()
+        for task in self._background_tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._background_tasks.clear()
+        for reader in self._readers:
+            await reader.close()
+        self._readers.clear()
+        self._reader_queue = None
         if self.conn:
+            await self.flush_pending_players()
             await self.conn.close()
             self.conn = None
-            logger.info("数据库连接已关闭。")
+            self._player_cache.clear()
+            logger.info(f"数据库连接已关闭。玩家缓存命中 {self.player_cache_hits} 次，未命中 {self.player_cache_misses} 次。")
+
+    # --- 玩家缓存 ---
+
+    def _cache_get_player(self, user_id: str) -> Optional[Player]:
+        cached = self._player_cache.get(user_id)
+        if cached is None:
+            self.player_cache_misses += 1
+            return None
+        self._player_cache.move_to_end(user_id)
+        self.player_cache_hits += 1
+        return cached.clone()
+
+    def _cache_fill_player(self, player: Player, epoch: int):
+        """读路径回填缓存；若读取期间有写路径改动过缓存则放弃回填"""
+        if self._player_cache_capacity <= 0 or epoch != self._player_cache_epoch:
+            return
+        if player.user_id not in self._player_cache:
+            self._store_player_in_cache(player)
+
+    def _cache_write_player(self, player: Player, columns: Optional[Iterable[str]] = None):
+        """写路径提交成功后调用，使缓存和排行榜与数据库保持一致。
+
+        columns 为本次实际写入的列；未写入的列在 player 上可能已过期，
+        因此只合并到已有的缓存副本上，而不会整行覆盖。
+        """
+        self._player_cache_epoch += 1
+        if columns is None or "level_index" in columns or "experience" in columns:
+            self.leaderboard.update(player.user_id, player.level_index, player.experience)
+        if self._player_cache_capacity <= 0:
+            return
+        if columns is None:
+            self._store_player_in_cache(player)
+            return
+        cached = self._player_cache.get(player.user_id)
+        if cached is None:
+            return
+        for column in columns:
+            setattr(cached, column, getattr(player, column))
+        cached.mark_clean()
+
+    def _store_player_in_cache(self, player: Player):
+        cached = player.clone()
+        cached.mark_clean()
+        self._player_cache[player.user_id] = cached
+        self._player_cache.move_to_end(player.user_id)
+        while len(self._player_cache) > self._player_cache_capacity:
+            self._player_cache.popitem(last=False)
+
+    def _cache_invalidate_player(self, user_id: str):
+        self._player_cache_epoch += 1
+        self._player_cache.pop(user_id, None)
+
+    def _apply_cached_player_delta(self, user_id: str, experience: int = 0, gold: int = 0, hp: int = 0):
+        """将原生 SQL 中的增量更新同步到缓存副本和排行榜上（与 SQL 语义保持一致）"""
+        self._player_cache_epoch += 1
+        self.leaderboard.add_experience(user_id, experience)
+        cached = self._player_cache.get(user_id)
+        if cached is None:
+            return
+        cached.experience += experience
+        cached.gold += gold
+        cached.hp = min(cached.max_hp, cached.hp + hp)
+        cached.mark_clean()
+
+    def get_player_cache_stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.player_cache_hits,
+            "misses": self.player_cache_misses,
+            "size": len(self._player_cache),
+            "capacity": self._player_cache_capacity,
+        }
+
+    def _get_update_sql(self, columns: Tuple[str, ...]) -> str:
+        sql = self._update_sql_cache.get(columns)
+        if sql is None:
+            set_clause = ", ".join([f"{c} = :{c}" for c in columns])
+            sql = f"UPDATE players SET {set_clause} WHERE user_id = :user_id"
+            self._update_sql_cache[columns] = sql
+        return sql
+
+    @staticmethod
+    def _dirty_columns(player: Player) -> Tuple[str, ...]:
+        return tuple(sorted(player.dirty_fields - {"user_id"}))
+
+    async def _wal_checkpoint_loop(self):
+        interval = self._storage_profile["checkpoint_interval"]
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with self._write_lock:
+                    async with self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)") as cursor:
+                        row = await cursor.fetchone()
+                if row and row[0]:
+                    logger.warning("WAL 检查点未能完成（数据库繁忙），将在下个周期重试。")
+            except aiosqlite.Error as e:
+                logger.error(f"执行 WAL 检查点失败: {e}")
+
+    async def verify_query_plans(self) -> List[str]:
+        """对已知热点查询执行 EXPLAIN QUERY PLAN，返回退化为扫描的查询名"""
+        degraded = []
+        for name, (sql, params) in _HOT_QUERIES.items():
+            async with self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params) as cursor:
+                details = [row["detail"] for row in await cursor.fetchall()]
+            is_full_scan = any(d.startswith("SCAN") and "INDEX" not in d for d in details)
+            uses_temp_sort = any("TEMP B-TREE" in d for d in details)
+            if is_full_scan or uses_temp_sort:
+                degraded.append(name)
+                logger.warning(f"热点查询「{name}」未使用索引，数据量增大后会变慢。查询计划: {' | '.join(details)}")
+        if not degraded:
+            logger.info(f"热点查询计划自检通过（共 {len(_HOT_QUERIES)} 条）。")
+        return degraded
+
+    # --- 延迟写入 ---
+
+    async def _write_behind_loop(self):
+        while True:
+            await asyncio.sleep(self._write_behind_interval)
+            try:
+                await self.flush_pending_players()
+            except aiosqlite.Error:
+                # 失败的批次已放回待写队列，下一轮重试
+                pass
+
+    async def flush_pending_players(self):
+        """将所有待写玩家在一个事务内批量提交；若已有批次正在提交，会等待其完成"""
+        if self.conn is None or (not self._pending_players and not self._flush_lock.locked()):
+            return
+        async with self._flush_lock:
+            if not self._pending_players:
+                return
+            batch = self._pending_players
+            self._pending_players = {}
+            self._flushing_players = batch
+            # 按脏列集合分组，每组一条 executemany
+            groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+            for player in batch.values():
+                groups.setdefault(self._dirty_columns(player), []).append(player.__dict__)
+            async with self._write_lock:
+                try:
+                    await self.conn.execute("BEGIN")
+                    for columns, params in groups.items():
+                        await self.conn.executemany(self._get_update_sql(columns), params)
+                    await self.conn.commit()
+                except aiosqlite.Error as e:
+                    await self.conn.rollback()
+                    logger.warning(f"批量延迟写入玩家数据失败（{len(batch)} 条），改为逐条提交: {e}")
+                    await self._flush_rows_individually(batch)
+                finally:
+                    self._flushing_players = {}
+                    # 提交期间读到旧行的请求不得回填缓存
+                    self._player_cache_epoch += 1
+            self.write_behind_flushes += 1
+            self.write_behind_rows += len(batch)
+
+    async def _flush_rows_individually(self, batch: Dict[str, Player]):
+        """批量提交失败后逐条重试（调用方已持有写锁）。
+
+        违反约束的行（如宗门已解散但 sect_id 仍指向它）重试也不会成功，记录后丢弃，
+        以免一行坏数据阻塞所有玩家的落盘；其余错误视为暂时性的，放回待写队列并抛出。
+        """
+        requeued = []
+        last_error = None
+        for user_id, player in batch.items():
+            columns = self._dirty_columns(player)
+            try:
+                await self.conn.execute("BEGIN")
+                await self.conn.execute(self._get_update_sql(columns), player.__dict__)
+                await self.conn.commit()
+            except aiosqlite.IntegrityError as e:
+                await self.conn.rollback()
+                logger.error(f"玩家 {user_id} 的延迟写入违反数据约束，已丢弃（列: {', '.join(columns)}）: {e}")
+                self._cache_invalidate_player(user_id)
+            except aiosqlite.Error as e:
+                await self.conn.rollback()
+                requeued.append((user_id, player))
+                last_error = e
+        # 放回暂时失败的行，并合并期间产生的新修改
+        for user_id, player in requeued:
+            newer = self._pending_players.get(user_id)
+            if newer is not None:
+                self._merge_dirty_columns(player, newer)
+            self._pending_players[user_id] = player
+        if last_error is not None:
+            logger.error(f"延迟写入玩家数据失败（{len(requeued)} 条），将稍后重试: {last_error}")
+            raise last_error
+
+    @staticmethod
+    def _merge_dirty_columns(target: Player, source: Player):
+        for column in source.dirty_fields:
+            setattr(target, column, getattr(source, column))
+
+    def get_write_behind_stats(self) -> Dict[str, int]:
+        return {
+            "enabled": int(self._write_behind_enabled),
+            "pending": len(self._pending_players),
+            "flushes": self.write_behind_flushes,
+            "rows": self.write_behind_rows,
+        }
+
+    # --- 世界Boss ---
 
     async def get_active_bosses(self) -> List[ActiveWorldBoss]:
-        async with self.conn.execute("SELECT * FROM active_world_bosses") as cursor:
-            rows = await cursor.fetchall()
-            return [ActiveWorldBoss(**dict(row)) for row in rows]
+        async with self._reader() as conn:
+            async with conn.execute("SELECT * FROM active_world_bosses") as cursor:
+                rows = await cursor.fetchall()
+                return [ActiveWorldBoss(**dict(row)) for row in rows]
 
     async def create_active_boss(self, boss: ActiveWorldBoss):
-        await self.conn.execute(
-            "INSERT INTO active_world_bosses (boss_id, current_hp, max_hp, spawned_at, level_index) VALUES (?, ?, ?, ?, ?)",
-            (boss.boss_id, boss.current_hp, boss.max_hp, boss.spawned_at, boss.level_index)
-        )
-        await self.conn.commit()
-
-    async def update_active_boss_hp(self, boss_id: str, new_hp: int):
-        await self.conn.execute(
-            "UPDATE active_world_bosses SET current_hp = ? WHERE boss_id = ?",
-            (new_hp, boss_id)
-        )
-        await self.conn.commit()
-
-    async def delete_active_boss(self, boss_id: str):
-        await self.conn.execute("DELETE FROM active_world_bosses WHERE boss_id = ?", (boss_id,))
-        await self.conn.commit()
-
-    async def record_boss_damage(self, boss_id: str, user_id: str, user_name: str, damage: int):
-        await self.conn.execute("""
-            INSERT INTO world_boss_participants (boss_id, user_id, user_name, total_damage) VALUES (?, ?, ?, ?)
-            ON CONFLICT(boss_id, user_id) DO UPDATE SET total_damage = total_damage + excluded.total_damage;
-        """, (boss_id, user_id, user_name, damage))
-        await self.conn.commit()
+        """生成Boss；覆盖上一只同ID Boss未能结算而残留的数据"""
+        async with self._write_lock:
+            try:
+                await self.conn.execute("BEGIN")
+                await self.conn.execute("DELETE FROM world_boss_participants WHERE boss_id = ?", (boss.boss_id,))
+                await self.conn.execute(
+                    "INSERT OR REPLACE INTO active_world_bosses (boss_id, current_hp, max_hp, spawned_at, level_index) VALUES (?, ?, ?, ?, ?)",
+                    (boss.boss_id, boss.current_hp, boss.max_hp, boss.spawned_at, boss.level_index)
+                )
+                await self.conn.commit()
+            except aiosqlite.Error as e:
+                await self.conn.rollback()
+                logger.error(f"生成Boss {boss.boss_id} 失败: {e}")
+                raise
+
+    async def save_boss_snapshot(self, hp_rows: List[Tuple[int, str]], damage_rows: List[Tuple[str, str, str, int]]):
+        """在一个事务内写入Boss血量快照 (current_hp, boss_id) 与累计伤害 (boss_id, user_id, user_name, total_damage)"""
+        if not hp_rows and not damage_rows:
+            return
+        async with self._write_lock:
+            try:
+                await self.conn.execute("BEGIN")
+                if hp_rows:
+                    await self.conn.executemany(
+                        "UPDATE active_world_bosses SET current_hp = ? WHERE boss_id = ?", hp_rows
+                    )
+                if damage_rows:
+                    await self.conn.executemany("""
+                        INSERT INTO world_boss_participants (boss_id, user_id, user_name, total_damage) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(boss_id, user_id) DO UPDATE SET
+                            user_name = excluded.user_name, total_damage = excluded.total_damage;
+                    """, damage_rows)
+                await self.conn.commit()
+            except aiosqlite.Error as e:
+                await self.conn.rollback()
+                logger.error(f"保存世界Boss快照失败: {e}")
+                raise
 
     async def get_boss_participants(self, boss_id: str) -> List[Dict[str, Any]]:
         sql = "SELECT user_id, user_name, total_damage FROM world_boss_participants WHERE boss_id = ? ORDER BY total_damage DESC"
-        async with self.conn.execute(sql, (boss_id,)) as cursor:
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
-
-    async def clear_boss_data(self, boss_id: str):
-        try:
-            await self.conn.execute("BEGIN")
-            await self.conn.execute("DELETE FROM active_world_bosses WHERE boss_id = ?", (boss_id,))
-            await self.conn.execute("DELETE FROM world_boss_participants WHERE boss_id = ?", (boss_id,))
-            await self.conn.commit()
-            logger.info(f"Boss {boss_id} 的数据已清理。")
-        except aiosqlite.Error as e:
-            await self.conn.rollback()
-            logger.error(f"清理Boss {boss_id} 数据失败: {e}")
-
-    async def get_top_players(self, limit: int) -> List[Player]:
-        async with self.conn.execute(
-            "SELECT * FROM players ORDER BY level_index DESC, experience DESC LIMIT ?", (limit,)
-        ) as cursor:
-            rows = await cursor.fetchall()
-            return [Player(**dict(row)) for row in rows]
+        async with self._reader() as conn:
+            async with conn.execute(sql, (boss_id,)) as cursor:
+                rows = await cursor.fetchall()
+                return [dict(row) for row in rows]
+
+    async def get_boss_schedule(self) -> Dict[str, float]:
+        """各Boss模板的下次刷新时间 boss_id -> next_spawn_at"""
+        async with self._reader() as conn:
+            async with conn.execute("SELECT boss_id, next_spawn_at FROM world_boss_schedule") as cursor:
+                return {row['boss_id']: row['next_spawn_at'] for row in await cursor.fetchall()}
+
+    async def settle_boss_rewards(self, boss_id: str, rewards: List[Tuple[int, int, str]],
+                                  next_spawn_at: Optional[float] = None) -> Set[str]:
+        """在一个事务内发放Boss奖励 (gold, experience, user_id)、清理该Boss的数据并记录下次刷新时间
+
+        返回实际获得奖励的 user_id；玩家行已不存在的参与者不在其中。
+        """
+        # 增量更新基于库中的最新值，待写的整行数据需先落盘
+        await self.flush_pending_players()
+        rewarded = []
+        async with self._write_lock:
+            try:
+                await self.conn.execute("BEGIN")
+                for reward in rewards:
+                    cursor = await self.conn.execute(
+                        "UPDATE players SET gold = gold + ?, experience = experience + ? WHERE user_id = ?",
+                        reward
+                    )
+                    if cursor.rowcount > 0:
+                        rewarded.append(reward)
+                await self.conn.execute("DELETE FROM active_world_bosses WHERE boss_id = ?", (boss_id,))
+                await self.conn.execute("DELETE FROM world_boss_participants WHERE boss_id = ?", (boss_id,))
+                if next_spawn_at is not None:
+                    await self.conn.execute(
+                        "INSERT OR REPLACE INTO world_boss_schedule (boss_id, next_spawn_at) VALUES (?, ?)",
+                        (boss_id, next_spawn_at)
+                    )
+                await self.conn.commit()
+            except aiosqlite.Error as e:
+                await self.conn.rollback()
+                logger.error(f"结算Boss {boss_id} 奖励失败: {e}")
+                raise
+        for gold, experience, user_id in rewarded:
+            self._apply_cached_player_delta(user_id, experience=experience, gold=gold)
+        logger.info(f"Boss {boss_id} 已结算，{len(rewarded)} 名参与者获得奖励。")
+        return {user_id for _, _, user_id in rewarded}
+
+    # --- 玩家 ---
+
+    async def rebuild_leaderboard(self):
+        """启动时从数据库整体重建内存排行榜"""
+        await self.flush_pending_players()
+        async with self._reader() as conn:
+            async with conn.execute("SELECT user_id, level_index, experience FROM players") as cursor:
+                rows = await cursor.fetchall()
+        self.leaderboard.rebuild((row["user_id"], row["level_index"], row["experience"]) for row in rows)
+        logger.info(f"排行榜已重建，共 {len(self.leaderboard)} 名玩家。")
 
     async def get_player_by_id(self, user_id: str) -> Optional[Player]:
-        async with self.conn.execute("SELECT * FROM players WHERE user_id = ?", (user_id,)) as cursor:
-            row = await cursor.fetchone()
-            return Player(**dict(row)) if row else None
+        cached = self._cache_get_player(user_id)
+        if cached is not None:
+            return cached
+
+        epoch = self._player_cache_epoch
+        async with self._reader() as conn:
+            async with conn.execute("SELECT * FROM players WHERE user_id = ?", (user_id,)) as cursor:
+                row = await cursor.fetchone()
+        if not row:
+            return None
+        player = Player(**dict(row))
+        # 已被缓存淘汰但尚未落盘（或正在提交）的修改，需叠加到库中读出的行上；待写队列中的更新较新，最后叠加
+        overlays = [p for p in (self._flushing_players.get(user_id), self._pending_players.get(user_id)) if p]
+        for pending in overlays:
+            self._merge_dirty_columns(player, pending)
+        if overlays:
+            player.mark_clean()
+        self._cache_fill_player(player, epoch)
+        return player
 
     async def create_player(self, player: Player):
         player_fields = [f.name for f in fields(Player)]
         columns = ", ".join(player_fields)
         placeholders = ", ".join([f":{f}" for f in player_fields])
         sql = f"INSERT INTO players ({columns}) VALUES ({placeholders})"
-        await self.conn.execute(sql, player.__dict__)
-        await self.conn.commit()
+        async with self._write_lock:
+            await self.conn.execute(sql, player.__dict__)
+            await self.conn.commit()
+        player.mark_clean()
+        self._cache_write_player(player)
 
     async def update_player(self, player: Player):
-        player_fields = [f.name for f in fields(Player) if f.name != 'user_id']
-        set_clause = ", ".join([f"{f} = :{f}" for f in player_fields])
-        sql = f"UPDATE players SET {set_clause} WHERE user_id = :user_id"
-        await self.conn.execute(sql, player.__dict__)
-        await self.conn.commit()
+        columns = self._dirty_columns(player)
+        if not columns:
+            return
 
-    async def update_players_in_transaction(self, players: List[Player]):
-        if not players:
+        if self._write_behind_enabled:
+            pending = self._pending_players.get(player.user_id)
+            if pending is None:
+                self._pending_players[player.user_id] = player.clone()
+            else:
+                self._merge_dirty_columns(pending, player)
+            self._cache_write_player(player, columns)
+            player.mark_clean()
+            if len(self._pending_players) >= self._write_behind_max_pending:
+                await self.flush_pending_players()
             return
-        player_fields = [f.name for f in fields(Player) if f.name != 'user_id']
-        set_clause = ", ".join([f"{f} = :{f}" for f in player_fields])
-        sql = f"UPDATE players SET {set_clause} WHERE user_id = :user_id"
-        try:
-            await self.conn.execute("BEGIN")
-            for player in players:
-                await self.conn.execute(sql, player.__dict__)
+
+        async with self._write_lock:
+            await self.conn.execute(self._get_update_sql(columns), player.__dict__)
             await self.conn.commit()
-        except aiosqlite.Error as e:
-            await self.conn.rollback()
-            logger.error(f"批量更新玩家事务失败: {e}")
-            raise
+        self._cache_write_player(player, columns)
+        player.mark_clean()
+
+    async def update_players_in_transaction(self, players: List[Player]):
+        updates = [(player, self._dirty_columns(player)) for player in players]
+        updates = [(player, columns) for player, columns in updates if columns]
+        if not updates:
+            return
+        await self.flush_pending_players()
+        async with self._write_lock:
+            try:
+                await self.conn.execute("BEGIN")
+                for player, columns in updates:
+                    await self.conn.execute(self._get_update_sql(columns), player.__dict__)
+                await self.conn.commit()
+            except aiosqlite.Error as e:
+                await self.conn.rollback()
+                logger.error(f"批量更新玩家事务失败: {e}")
+                raise
+        for player, columns in updates:
+            self._cache_write_player(player, columns)
+            player.mark_clean()
+
+    async def apply_player_deltas(self, player: Player, deltas: Dict[str, int],
+                                  items: Optional[Dict[str, int]] = None):
+        """在一个事务内提交玩家的一次结算
+
+        deltas 中的数值列以 ``col = col + ?`` 的方式累加，不会覆盖其他写路径同时产生的增减；
+        player 上其余被修改的列（状态、秘境楼层、气血等）按值写入；items 一并加入背包。
+        """
+        for column in deltas:
+            if column not in PLAYER_COLUMNS:
+                raise ValueError(f"未知的玩家字段: {column}")
+        delta_columns = tuple(sorted(c for c, d in deltas.items() if d))
+        columns = tuple(c for c in self._dirty_columns(player) if c not in deltas)
+        items = {item_id: qty for item_id, qty in (items or {}).items() if qty > 0}
+        if not columns and not delta_columns and not items:
+            return
+
+        set_clause = [f"{c} = :{c}" for c in columns] + [f"{c} = {c} + :delta_{c}" for c in delta_columns]
+        params = dict(player.__dict__)
+        params.update({f"delta_{c}": deltas[c] for c in delta_columns})
+
+        async with self._flush_lock:
+            # 待写的整行数据若晚于本次增量落盘会将其覆盖，因此并入同一事务先行写入
+            pending = self._pending_players.pop(player.user_id, None)
+            if pending is not None:
+                self._flushing_players = {player.user_id: pending}
+            async with self._write_lock:
+                try:
+                    await self.conn.execute("BEGIN")
+                    if pending is not None:
+                        await self.conn.execute(self._get_update_sql(self._dirty_columns(pending)), pending.__dict__)
+                    if set_clause:
+                        await self.conn.execute(
+                            f"UPDATE players SET {', '.join(set_clause)} WHERE user_id = :user_id", params
+                        )
+                    for item_id, quantity in items.items():
+                        await self.conn.execute("""
+                            INSERT INTO inventory (user_id, item_id, quantity) VALUES (?, ?, ?)
+                            ON CONFLICT(user_id, item_id) DO UPDATE SET quantity = quantity + excluded.quantity;
+                        """, (player.user_id, item_id, quantity))
+                    await self.conn.commit()
+                except aiosqlite.Error as e:
+                    await self.conn.rollback()
+                    if pending is not None and player.user_id not in self._pending_players:
+                        self._pending_players[player.user_id] = pending
+                    logger.error(f"玩家结算事务失败: {e}")
+                    raise
+                finally:
+                    self._flushing_players = {}
+
+        self._cache_write_player(player, columns)
+        if "level_index" not in columns:
+            self.leaderboard.add_experience(player.user_id, deltas.get("experience", 0))
+        cached = self._player_cache.get(player.user_id)
+        if cached is not None:
+            for column in delta_columns:
+                setattr(cached, column, getattr(cached, column) + deltas[column])
+            cached.mark_clean()
+        player.mark_clean()
+
+    # --- 宗门 ---
 
     async def create_sect(self, sect_name: str, leader_id: str) -> int:
-        async with self.conn.execute("INSERT INTO sects (name, leader_id) VALUES (?, ?)", (sect_name, leader_id)) as cursor:
-            await self.conn.commit()
-            return cursor.lastrowid
+        async with self._write_lock:
+            async with self.conn.execute("INSERT INTO sects (name, leader_id) VALUES (?, ?)", (sect_name, leader_id)) as cursor:
+                await self.conn.commit()
+                return cursor.lastrowid
 
     async def delete_sect(self, sect_id: int):
-        await self.conn.execute("DELETE FROM sects WHERE id = ?", (sect_id,))
-        await self.conn.commit()
+        # 待写玩家若仍指向该宗门，落盘时会违反外键约束，需先提交
+        await self.flush_pending_players()
+        async with self._write_lock:
+            await self.conn.execute("DELETE FROM sects WHERE id = ?", (sect_id,))
+            await self.conn.commit()
+            # 提交之后才入队的加入宗门修改同样会违反外键，按 ON DELETE SET NULL 的语义改写
+            for pending in (*self._pending_players.values(), *self._flushing_players.values()):
+                if pending.sect_id == sect_id:
+                    pending.sect_id = None
+                    pending.sect_name = None
+        # 外键 ON DELETE SET NULL 会修改成员的 sect_id，需同步淘汰缓存
+        for user_id in [uid for uid, p in self._player_cache.items() if p.sect_id == sect_id]:
+            self._cache_invalidate_player(user_id)
 
     async def get_sect_by_name(self, sect_name: str) -> Optional[Dict[str, Any]]:
         async with self.conn.execute("SELECT * FROM sects WHERE name = ?", (sect_name,)) as cursor:
@@ -142,34 +651,42 @@ class DataBase:
             return dict(row) if row else None
 
     async def get_sect_members(self, sect_id: int) -> List[Player]:
-        async with self.conn.execute("SELECT * FROM players WHERE sect_id = ?", (sect_id,)) as cursor:
-            rows = await cursor.fetchall()
-            return [Player(**dict(row)) for row in rows]
+        await self.flush_pending_players()
+        async with self._reader() as conn:
+            async with conn.execute("SELECT * FROM players WHERE sect_id = ?", (sect_id,)) as cursor:
+                rows = await cursor.fetchall()
+                return [Player(**dict(row)) for row in rows]
 
     async def update_player_sect(self, user_id: str, sect_id: Optional[int], sect_name: Optional[str]):
-        await self.conn.execute("UPDATE players SET sect_id = ?, sect_name = ? WHERE user_id = ?", (sect_id, sect_name, user_id))
-        await self.conn.commit()
+        await self.flush_pending_players()
+        async with self._write_lock:
+            await self.conn.execute("UPDATE players SET sect_id = ?, sect_name = ? WHERE user_id = ?", (sect_id, sect_name, user_id))
+            await self.conn.commit()
+        self._cache_invalidate_player(user_id)
+
+    # --- 背包 ---
 
     async def get_inventory_by_user_id(self, user_id: str, config_manager: ConfigManager) -> List[Dict[str, Any]]:
-        async with self.conn.execute("SELECT item_id, quantity FROM inventory WHERE user_id = ?", (user_id,)) as cursor:
-            rows = await cursor.fetchall()
-            inventory_list = []
-            for row in rows:
-                item_id, quantity = row['item_id'], row['quantity']
-                item_info = config_manager.item_data.get(str(item_id))
-                if item_info:
-                     inventory_list.append({
-                        "item_id": item_id, "name": item_info.name,
-                        "quantity": quantity, "description": item_info.description,
-                        "rank": item_info.rank, "type": item_info.type
-                    })
-                else:
-                    inventory_list.append({
-                        "item_id": item_id, "name": f"未知物品(ID:{item_id})",
-                        "quantity": quantity, "description": "此物品信息已丢失",
-                        "rank": "未知", "type": "未知"
-                    })
-            return inventory_list
+        async with self._reader() as conn:
+            async with conn.execute("SELECT item_id, quantity FROM inventory WHERE user_id = ?", (user_id,)) as cursor:
+                rows = await cursor.fetchall()
+        inventory_list = []
+        for row in rows:
+            item_id, quantity = row['item_id'], row['quantity']
+            item_info = config_manager.item_data.get(str(item_id))
+            if item_info:
+                 inventory_list.append({
+                    "item_id": item_id, "name": item_info.name,
+                    "quantity": quantity, "description": item_info.description,
+                    "rank": item_info.rank, "type": item_info.type
+                })
+            else:
+                inventory_list.append({
+                    "item_id": item_id, "name": f"未知物品(ID:{item_id})",
+                    "quantity": quantity, "description": "此物品信息已丢失",
+                    "rank": "未知", "type": "未知"
+                })
+        return inventory_list
 
     async def get_item_from_inventory(self, user_id: str, item_id: str) -> Optional[Dict[str, Any]]:
         async with self.conn.execute("SELECT item_id, quantity FROM inventory WHERE user_id = ? AND item_id = ?", (user_id, item_id)) as cursor:
@@ -177,88 +694,97 @@ class DataBase:
             return dict(row) if row else None
 
     async def add_items_to_inventory_in_transaction(self, user_id: str, items: Dict[str, int]):
-        try:
-            await self.conn.execute("BEGIN")
-            for item_id, quantity in items.items():
-                await self.conn.execute("""
-                    INSERT INTO inventory (user_id, item_id, quantity) VALUES (?, ?, ?)
-                    ON CONFLICT(user_id, item_id) DO UPDATE SET quantity = quantity + excluded.quantity;
-                """, (user_id, item_id, quantity))
-            await self.conn.commit()
-        except aiosqlite.Error as e:
-            await self.conn.rollback()
-            logger.error(f"批量添加物品事务失败: {e}")
-            raise
+        async with self._write_lock:
+            try:
+                await self.conn.execute("BEGIN")
+                for item_id, quantity in items.items():
+                    await self.conn.execute("""
+                        INSERT INTO inventory (user_id, item_id, quantity) VALUES (?, ?, ?)
+                        ON CONFLICT(user_id, item_id) DO UPDATE SET quantity = quantity + excluded.quantity;
+                    """, (user_id, item_id, quantity))
+                await self.conn.commit()
+            except aiosqlite.Error as e:
+                await self.conn.rollback()
+                logger.error(f"批量添加物品事务失败: {e}")
+                raise
 
     async def remove_item_from_inventory(self, user_id: str, item_id: str, quantity: int = 1) -> bool:
-        try:
-            await self.conn.execute("BEGIN")
-            cursor = await self.conn.execute("""
-                UPDATE inventory SET quantity = quantity - ?
-                WHERE user_id = ? AND item_id = ? AND quantity >= ?
-            """, (quantity, user_id, item_id, quantity))
-
-            if cursor.rowcount == 0:
+        async with self._write_lock:
+            try:
+                await self.conn.execute("BEGIN")
+                cursor = await self.conn.execute("""
+                    UPDATE inventory SET quantity = quantity - ?
+                    WHERE user_id = ? AND item_id = ? AND quantity >= ?
+                """, (quantity, user_id, item_id, quantity))
+
+                if cursor.rowcount == 0:
+                    await self.conn.rollback()
+                    return False
+
+                await self.conn.execute("DELETE FROM inventory WHERE user_id = ? AND item_id = ? AND quantity <= 0", (user_id, item_id))
+                await self.conn.commit()
+                return True
+            except aiosqlite.Error as e:
                 await self.conn.rollback()
+                logger.error(f"移除物品事务失败: {e}")
                 return False
 
-            await self.conn.execute("DELETE FROM inventory WHERE user_id = ? AND item_id = ? AND quantity <= 0", (user_id, item_id))
-            await self.conn.commit()
-            return True
-        except aiosqlite.Error as e:
-            await self.conn.rollback()
-            logger.error(f"移除物品事务失败: {e}")
-            return False
-
     async def transactional_buy_item(self, user_id: str, item_id: str, quantity: int, total_cost: int) -> Tuple[bool, str]:
-        try:
-            await self.conn.execute("BEGIN")
-            cursor = await self.conn.execute(
-                "UPDATE players SET gold = gold - ? WHERE user_id = ? AND gold >= ?",
-                (total_cost, user_id, total_cost)
-            )
-            if cursor.rowcount == 0:
-                await self.conn.rollback()
-                return False, "ERROR_INSUFFICIENT_FUNDS"
+        # 增量更新依赖库中的最新灵石，且待写的整行数据落盘时会覆盖本次扣款，需先提交
+        await self.flush_pending_players()
+        async with self._write_lock:
+            try:
+                await self.conn.execute("BEGIN")
+                cursor = await self.conn.execute(
+                    "UPDATE players SET gold = gold - ? WHERE user_id = ? AND gold >= ?",
+                    (total_cost, user_id, total_cost)
+                )
+                if cursor.rowcount == 0:
+                    await self.conn.rollback()
+                    return False, "ERROR_INSUFFICIENT_FUNDS"
 
-            await self.conn.execute("""
-                INSERT INTO inventory (user_id, item_id, quantity) VALUES (?, ?, ?)
-                ON CONFLICT(user_id, item_id) DO UPDATE SET quantity = quantity + excluded.quantity;
-            """, (user_id, item_id, quantity))
+                await self.conn.execute("""
+                    INSERT INTO inventory (user_id, item_id, quantity) VALUES (?, ?, ?)
+                    ON CONFLICT(user_id, item_id) DO UPDATE SET quantity = quantity + excluded.quantity;
+                """, (user_id, item_id, quantity))
 
-            await self.conn.commit()
-            return True, "SUCCESS"
-        except aiosqlite.Error as e:
-            await self.conn.rollback()
-            logger.error(f"购买物品事务失败: {e}")
-            return False, "ERROR_DATABASE"
+                await self.conn.commit()
+                self._apply_cached_player_delta(user_id, gold=-total_cost)
+                return True, "SUCCESS"
+            except aiosqlite.Error as e:
+                await self.conn.rollback()
+                logger.error(f"购买物品事务失败: {e}")
+                return False, "ERROR_DATABASE"
 
     async def transactional_apply_item_effect(self, user_id: str, item_id: str, quantity: int, effect: PlayerEffect) -> bool:
-        try:
-            await self.conn.execute("BEGIN")
-            cursor = await self.conn.execute(
-                "UPDATE inventory SET quantity = quantity - ? WHERE user_id = ? AND item_id = ? AND quantity >= ?",
-                (quantity, user_id, item_id, quantity)
-            )
-            if cursor.rowcount == 0:
+        await self.flush_pending_players()
+        async with self._write_lock:
+            try:
+                await self.conn.execute("BEGIN")
+                cursor = await self.conn.execute(
+                    "UPDATE inventory SET quantity = quantity - ? WHERE user_id = ? AND item_id = ? AND quantity >= ?",
+                    (quantity, user_id, item_id, quantity)
+                )
+                if cursor.rowcount == 0:
+                    await self.conn.rollback()
+                    return False
+
+                await self.conn.execute("DELETE FROM inventory WHERE user_id = ? AND item_id = ? AND quantity <= 0", (user_id, item_id))
+
+                await self.conn.execute(
+                    """
+                    UPDATE players
+                    SET experience = experience + ?,
+                        gold = gold + ?,
+                        hp = MIN(max_hp, hp + ?)
+                    WHERE user_id = ?
+                    """,
+                    (effect.experience, effect.gold, effect.hp, user_id)
+                )
+                await self.conn.commit()
+                self._apply_cached_player_delta(user_id, experience=effect.experience, gold=effect.gold, hp=effect.hp)
+                return True
+            except aiosqlite.Error as e:
                 await self.conn.rollback()
+                logger.error(f"使用物品事务失败: {e}")
                 return False
-
-            await self.conn.execute("DELETE FROM inventory WHERE user_id = ? AND item_id = ? AND quantity <= 0", (user_id, item_id))
-
-            await self.conn.execute(
-                """
-                UPDATE players
-                SET experience = experience + ?,
-                    gold = gold + ?,
-                    hp = MIN(max_hp, hp + ?)
-                WHERE user_id = ?
-                """,
-                (effect.experience, effect.gold, effect.hp, user_id)
-            )
-            await self.conn.commit()
-            return True
-        except aiosqlite.Error as e:
-            await self.conn.rollback()
-            logger.error(f"使用物品事务失败: {e}")
-            return False
\ No newline at end of file
@@ -0,0 +1,76 @@
+# data/leaderboard.py
+
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+class RankEntry(NamedTuple):
+    rank: int
+    user_id: str
+    level_index: int
+    experience: int
+    display_name: Optional[str] = None
+
+class Leaderboard:
+    """常驻内存的排行榜，按 (境界, 修为) 倒序、user_id 正序排列，与 idx_players_rank 一致
+
+    有序列表的元素为 (-level_index, -experience, user_id)，排名即二分查找得到的下标。
+    由 DataBase 的各个写路径增量维护，启动时从数据库整体重建。
+    展示名称只保存在内存中（玩家使用指令时记录），不参与排序，重建时保留。
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[int, int, str]] = []
+        self._by_user: Dict[str, Tuple[int, int, str]] = {}
+        self._names: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def rebuild(self, rows: Iterable[Tuple[str, int, int]]):
+        self._by_user = {user_id: (-level_index, -experience, user_id) for user_id, level_index, experience in rows}
+        self._keys = sorted(self._by_user.values())
+
+    def update(self, user_id: str, level_index: int, experience: int):
+        key = (-level_index, -experience, user_id)
+        old = self._by_user.get(user_id)
+        if old == key:
+            return
+        if old is not None:
+            del self._keys[bisect_left(self._keys, old)]
+        self._by_user[user_id] = key
+        insort(self._keys, key)
+
+    def set_name(self, user_id: str, display_name: Optional[str]):
+        if display_name:
+            self._names[user_id] = display_name
+
+    def add_experience(self, user_id: str, delta: int):
+        """同步 SQL 侧的修为增量；不在榜上的玩家忽略（下次整行写入时补上）"""
+        old = self._by_user.get(user_id)
+        if old is not None and delta:
+            self.update(user_id, -old[0], -old[1] + delta)
+
+    def remove(self, user_id: str):
+        old = self._by_user.pop(user_id, None)
+        self._names.pop(user_id, None)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, old)]
+
+    def _entry(self, index: int) -> RankEntry:
+        neg_level, neg_exp, user_id = self._keys[index]
+        return RankEntry(index + 1, user_id, -neg_level, -neg_exp, self._names.get(user_id))
+
+    def top(self, limit: int) -> List[RankEntry]:
+        return [self._entry(i) for i in range(min(limit, len(self._keys)))]
+
+    def rank_of(self, user_id: str) -> Optional[int]:
+        key = self._by_user.get(user_id)
+        return bisect_left(self._keys, key) + 1 if key is not None else None
+
+    def around(self, user_id: str, radius: int = 2) -> List[RankEntry]:
+        """返回玩家自己及其前后各 radius 名"""
+        rank = self.rank_of(user_id)
+        if rank is None:
+            return []
+        start = max(0, rank - 1 - radius)
+        return [self._entry(i) for i in range(start, min(len(self._keys), rank + radius))]
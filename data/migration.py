@@ -4,8 +4,9 @@ import aiosqlite
 from typing import Dict, Callable, Awaitable
 from astrbot.api import logger
 from ..config_manager import ConfigManager
+from ..realm_codec import decode_realm, encode_realm
 
-LATEST_DB_VERSION = 9 # 版本号提升
+LATEST_DB_VERSION = 13 # 版本号提升
 
 MIGRATION_TASKS: Dict[int, Callable[[aiosqlite.Connection, ConfigManager], Awaitable[None]]] = {}
 
@@ -32,6 +33,9 @@ class MigrationManager:
                 await self.conn.execute("BEGIN")
                 # 使用最新的建表函数
                 await _create_all_tables_v9(self.conn)
+                await _create_player_indexes_v10(self.conn)
+                await _create_boss_schedule_table_v12(self.conn)
+                await _create_boss_participant_index_v13(self.conn)
                 await self.conn.execute("INSERT INTO db_info (version) VALUES (?)", (LATEST_DB_VERSION,))
                 await self.conn.commit()
                 logger.info(f"数据库已初始化到最新版本: v{LATEST_DB_VERSION}")
@@ -117,6 +121,35 @@ async def _create_all_tables_v9(conn: aiosqlite.Connection):
         )
     """)
 
+async def _create_player_indexes_v10(conn: aiosqlite.Connection):
+    # 排行榜按 (境界, 修为) 倒序取前N名；附带 user_id 使只取排名的查询无需回表
+    await conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_players_rank
+        ON players (level_index DESC, experience DESC, user_id)
+    """)
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_players_sect ON players (sect_id)")
+    # 同一时间身处秘境的玩家很少，部分索引只收录这些行
+    await conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_players_in_realm
+        ON players (realm_id) WHERE realm_id IS NOT NULL
+    """)
+
+async def _create_boss_schedule_table_v12(conn: aiosqlite.Connection):
+    # 每个Boss模板的下次刷新时间，重启后据此恢复冷却计时
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS world_boss_schedule (
+            boss_id TEXT PRIMARY KEY,
+            next_spawn_at REAL NOT NULL
+        )
+    """)
+
+async def _create_boss_participant_index_v13(conn: aiosqlite.Connection):
+    # 按伤害倒序读取某个Boss的参与者（启动时恢复账本与伤害榜）无需临时排序
+    await conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_boss_participants_damage
+        ON world_boss_participants (boss_id, total_damage DESC)
+    """)
+
 @migration(2)
 async def _upgrade_v1_to_v2(conn: aiosqlite.Connection, config_manager: ConfigManager):
     await conn.execute("PRAGMA foreign_keys = OFF")
@@ -280,4 +313,43 @@ async def _upgrade_v8_to_v9(conn: aiosqlite.Connection, config_manager: ConfigMa
             await conn.execute("ALTER TABLE players ADD COLUMN equipped_armor TEXT")
         if 'equipped_accessory' not in columns:
             await conn.execute("ALTER TABLE players ADD COLUMN equipped_accessory TEXT")
-    logger.info("v8 -> v9 数据库迁移完成！")
\ No newline at end of file
+    logger.info("v8 -> v9 数据库迁移完成！")
+
+@migration(10)
+async def _upgrade_v9_to_v10(conn: aiosqlite.Connection, config_manager: ConfigManager):
+    """为 players 表的热点查询添加二级索引"""
+    logger.info("开始执行 v9 -> v10 数据库迁移...")
+    await _create_player_indexes_v10(conn)
+    logger.info("v9 -> v10 数据库迁移完成！")
+
+@migration(11)
+async def _upgrade_v10_to_v11(conn: aiosqlite.Connection, config_manager: ConfigManager):
+    """将 players.realm_data 由 JSON 文本转换为二进制秘境编码"""
+    logger.info("开始执行 v10 -> v11 数据库迁移...")
+    async with conn.execute("SELECT user_id, realm_data FROM players WHERE typeof(realm_data) = 'text'") as cursor:
+        rows = await cursor.fetchall()
+
+    converted = []
+    for row in rows:
+        instance = decode_realm(row['realm_data'])
+        if instance is None:
+            # 无法解析的旧数据保持原样，运行时按旧格式处理
+            logger.warning(f"玩家 {row['user_id']} 的秘境数据无法解析，跳过转换。")
+            continue
+        converted.append((encode_realm(instance), row['user_id']))
+
+    if converted:
+        await conn.executemany("UPDATE players SET realm_data = ? WHERE user_id = ?", converted)
+    logger.info(f"v10 -> v11 数据库迁移完成！共转换 {len(converted)} 条秘境数据。")
+
+@migration(12)
+async def _upgrade_v11_to_v12(conn: aiosqlite.Connection, config_manager: ConfigManager):
+    """新增世界Boss刷新时间表"""
+    await _create_boss_schedule_table_v12(conn)
+    logger.info("v11 -> v12 数据库迁移完成！已创建世界Boss刷新时间表。")
+
+@migration(13)
+async def _upgrade_v12_to_v13(conn: aiosqlite.Connection, config_manager: ConfigManager):
+    """为世界Boss伤害记录新增按伤害排序的索引"""
+    await _create_boss_participant_index_v13(conn)
+    logger.info("v12 -> v13 数据库迁移完成！已创建世界Boss伤害索引。")
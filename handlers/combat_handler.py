@@ -1,9 +1,11 @@
 # handlers/combat_handler.py
+import time
+
 from astrbot.api.event import AstrMessageEvent
 from astrbot.api import AstrBotConfig
 from astrbot.core.message.components import At
 from ..data import DataBase
-from ..core import BattleManager
+from ..core import BattleManager, WorldBossState, BossScheduler
 from ..config_manager import ConfigManager
 from ..models import Player
 from .utils import player_required
@@ -16,11 +18,14 @@ __all__ = ["CombatHandler"]
 class CombatHandler:
     # 战斗相关指令处理器
     
-    def __init__(self, db: DataBase, config: AstrBotConfig, config_manager: ConfigManager):
+    def __init__(self, db: DataBase, config: AstrBotConfig, config_manager: ConfigManager,
+                 boss_state: WorldBossState, boss_scheduler: BossScheduler):
         self.db = db
         self.config = config
         self.config_manager = config_manager
-        self.battle_manager = BattleManager(db, config, config_manager)
+        self.boss_state = boss_state
+        self.boss_scheduler = boss_scheduler
+        self.battle_manager = BattleManager(db, config, config_manager, boss_state, boss_scheduler)
 
     @player_required
     async def handle_spar(self, attacker: Player, event: AstrMessageEvent):
@@ -66,7 +71,9 @@ class CombatHandler:
         active_bosses_with_templates = await self.battle_manager.ensure_bosses_are_spawned()
 
         if not active_bosses_with_templates:
-            yield event.plain_result("天地间一片祥和，暂无妖兽作乱。")
+            msg = "天地间一片祥和，暂无妖兽作乱。"
+            upcoming = self._format_upcoming()
+            yield event.plain_result(f"{msg}\n{upcoming}" if upcoming else msg)
             return
 
         report = ["--- 当前可讨伐的世界Boss ---"]
@@ -75,15 +82,29 @@ class CombatHandler:
                 f"【{template.name}】 (ID: {instance.boss_id})\n"
                 f"  ❤️剩余生命: {instance.current_hp}/{instance.max_hp}"
             )
-            participants = await self.db.get_boss_participants(instance.boss_id)
+            participants = self.boss_state.top_participants(instance.boss_id)
             if participants:
                 report.append("  - 伤害贡献榜 -")
-                for p_data in participants[:3]:
+                for p_data in participants:
                     report.append(f"    - {p_data['user_name']}: {p_data['total_damage']} 伤害")
 
+        upcoming = self._format_upcoming()
+        if upcoming:
+            report.append(upcoming)
         report.append(f"\n使用「{CMD_FIGHT_BOSS} <Boss ID>」发起挑战！")
         yield event.plain_result("\n".join(report))
 
+    def _format_upcoming(self) -> str:
+        pending = self.boss_scheduler.next_spawns()
+        if not pending:
+            return ""
+        now = time.time()
+        lines = ["--- 蛰伏中的Boss ---"]
+        for boss_id, spawn_at in pending[:3]:
+            name = self.config_manager.boss_data[boss_id].get("name", boss_id)
+            lines.append(f"  【{name}】约 {max(1, int((spawn_at - now) / 60) + 1)} 分钟后现世")
+        return "\n".join(lines)
+
     @player_required
     async def handle_fight_boss(self, player: Player, event: AstrMessageEvent, boss_id: str):
         if not boss_id:
@@ -1,6 +1,10 @@
 # handlers/misc_handler.py
+from astrbot.api import logger
 from astrbot.api.event import AstrMessageEvent
 from ..data import DataBase
+from ..config_manager import ConfigManager
+from ..core import Metrics
+from .utils import player_locks
 
 CMD_START_XIUXIAN="我要修仙"
 CMD_PLAYER_INFO="我的信息"
@@ -23,16 +27,22 @@ CMD_FIGHT_BOSS="讨伐boss"
 CMD_ENTER_REALM="探索秘境"
 CMD_REALM_ADVANCE="前进"
 CMD_LEAVE_REALM="离开秘境"
+CMD_LEADERBOARD="修仙排行"
+CMD_MY_RANK="我的排名"
 CMD_MY_EQUIPMENT="我的装备"
 CMD_UNEQUIP="卸下"
+CMD_RELOAD_CONFIG="重载修仙配置"
+CMD_STATUS="修仙状态"
 
 __all__ = ["MiscHandler"]
 
 class MiscHandler:
     # 杂项指令处理器
     
-    def __init__(self, db: DataBase):
+    def __init__(self, db: DataBase, config_manager: ConfigManager, metrics: Metrics):
         self.db = db
+        self.config_manager = config_manager
+        self.metrics = metrics
 
     async def handle_help(self, event: AstrMessageEvent):
         help_text = (
@@ -40,6 +50,8 @@ class MiscHandler:
             f"【{CMD_START_XIUXIAN}】: 开启修仙之旅。\n"
             f"【{CMD_PLAYER_INFO}】: 查看人物信息。\n"
             f"【{CMD_CHECK_IN}】: 每日签到。\n"
+            f"【{CMD_LEADERBOARD}】: 查看修仙排行榜。\n"
+            f"【{CMD_MY_RANK}】: 查看自己的排名及前后道友。\n"
             "--- 修炼与成长 ---\n"
             f"【{CMD_START_CULTIVATION}】: 开始闭关。\n"
             f"【{CMD_END_CULTIVATION}】: 结束闭关。\n"
@@ -64,6 +76,36 @@ class MiscHandler:
             f"【{CMD_ENTER_REALM}】: 进入秘境。\n"
             f"【{CMD_REALM_ADVANCE}】: 在秘境中前进。\n"
             f"【{CMD_LEAVE_REALM}】: 离开秘境。\n"
+            "--- 管理 ---\n"
+            f"【{CMD_RELOAD_CONFIG}】: 重新加载物品、怪物等数据文件（管理员）。\n"
+            f"【{CMD_STATUS}】: 查看指令与数据库耗时统计（管理员）。\n"
             "--------------------"
         )
-        yield event.plain_result(help_text)
\ No newline at end of file
+        yield event.plain_result(help_text)
+
+    async def handle_reload_config(self, event: AstrMessageEvent):
+        try:
+            snapshot = await self.config_manager.reload_async()
+        except Exception as e:
+            logger.error(f"手动重载修仙配置失败: {e}")
+            yield event.plain_result(f"配置重载失败，仍在使用版本 {self.config_manager.version}：{e}")
+            return
+        yield event.plain_result(
+            f"配置已重载至版本 {snapshot.version}：物品 {len(snapshot.item_data)} 件，"
+            f"怪物 {len(snapshot.monster_data)} 种，Boss {len(snapshot.boss_data)} 种。"
+        )
+
+    async def handle_status(self, event: AstrMessageEvent):
+        if self.metrics.enabled:
+            lines = [self.metrics.summary()]
+        else:
+            lines = ["性能统计未开启，请在插件配置中打开 PERFORMANCE.METRICS_ENABLED 以查看指令耗时。"]
+        cache = self.db.get_player_cache_stats()
+        write_behind = self.db.get_write_behind_stats()
+        lines.extend([
+            "--- 缓存、写入与并发 ---",
+            "玩家缓存: " + ", ".join(f"{k}={v}" for k, v in cache.items()),
+            "延迟写入: " + ", ".join(f"{k}={v}" for k, v in write_behind.items()),
+            "玩家锁: " + ", ".join(f"{k}={v}" for k, v in player_locks.get_stats().items()),
+        ])
+        yield event.plain_result("\n".join(lines))
@@ -10,6 +10,9 @@ from .utils import player_required
 CMD_START_XIUXIAN = "我要修仙"
 CMD_PLAYER_INFO = "我的信息"
 CMD_CHECK_IN = "签到"
+CMD_MY_RANK = "我的排名"
+
+LEADERBOARD_SIZE = 10
 
 __all__ = ["PlayerHandler"]
 
@@ -30,6 +33,7 @@ class PlayerHandler:
 
         new_player = self.cultivation_manager.generate_new_player_stats(user_id)
         await self.db.create_player(new_player)
+        self.db.leaderboard.set_name(user_id, event.get_sender_name())
         reply_msg = (
             f"恭喜道友 {event.get_sender_name()} 踏上仙途！\n"
             f"初始灵根：【{new_player.spiritual_root}】\n"
@@ -92,7 +96,8 @@ class PlayerHandler:
     async def handle_end_cultivation(self, player: Player, event: AstrMessageEvent):
         success, msg, updated_player = self.cultivation_manager.handle_end_cultivation(player)
         if success and updated_player:
-            await self.db.update_player(updated_player)
+            deltas = {"experience": updated_player.experience - player.experience}
+            await self.db.apply_player_deltas(updated_player, deltas)
         yield event.plain_result(msg)
 
     @player_required
@@ -108,4 +113,35 @@ class PlayerHandler:
         success, msg, updated_player = self.cultivation_manager.handle_reroll_spirit_root(player)
         if success and updated_player:
             await self.db.update_player(updated_player)
-        yield event.plain_result(msg)
\ No newline at end of file
+        yield event.plain_result(msg)
+
+    def _format_rank_entry(self, entry, marker: str = "") -> str:
+        level_name = self.config_manager.level_data[entry.level_index]["level_name"] \
+            if 0 <= entry.level_index < len(self.config_manager.level_data) else "未知境界"
+        # 不公开QQ号：重启后尚未使用过指令、没有记录昵称的玩家只显示号码末四位
+        name = entry.display_name or f"道友{entry.user_id[-4:]}"
+        return f"{entry.rank}. {name} 【{level_name}】 修为 {entry.experience}{marker}"
+
+    async def handle_leaderboard(self, event: AstrMessageEvent):
+        leaderboard = self.db.leaderboard
+        leaderboard.set_name(event.get_sender_id(), event.get_sender_name())
+        entries = leaderboard.top(LEADERBOARD_SIZE)
+        if not entries:
+            yield event.plain_result("仙途漫漫，尚无道友上榜。")
+            return
+        lines = [f"--- 修仙排行榜（共 {len(leaderboard)} 位道友）---"]
+        lines.extend(self._format_rank_entry(entry) for entry in entries)
+        lines.append(f"发送「{CMD_MY_RANK}」查看自己的排名。")
+        yield event.plain_result("\n".join(lines))
+
+    @player_required
+    async def handle_my_rank(self, player: Player, event: AstrMessageEvent):
+        leaderboard = self.db.leaderboard
+        rank = leaderboard.rank_of(player.user_id)
+        if rank is None:
+            yield event.plain_result("排行榜正在整理中，请稍后再试。")
+            return
+        lines = [f"道友 {event.get_sender_name()} 当前位列第 {rank} 名（共 {len(leaderboard)} 位道友）"]
+        for entry in leaderboard.around(player.user_id):
+            lines.append(self._format_rank_entry(entry, " ← 你" if entry.user_id == player.user_id else ""))
+        yield event.plain_result("\n".join(lines))
@@ -35,10 +35,14 @@ class RealmHandler:
 
         success, msg, updated_player, gained_items = await self.realm_manager.advance_session(player)
 
-        await self.db.update_player(updated_player)
+        # 灵石与修为以增量写入，与楼层进度、掉落物品在同一事务中提交
+        deltas = {
+            "gold": updated_player.gold - player.gold,
+            "experience": updated_player.experience - player.experience,
+        }
+        await self.db.apply_player_deltas(updated_player, deltas, gained_items)
 
         if gained_items:
-            await self.db.add_items_to_inventory_in_transaction(updated_player.user_id, gained_items)
             item_log = []
             for item_id, qty in gained_items.items():
                 item = self.config_manager.item_data.get(str(item_id))
@@ -55,8 +59,8 @@ class RealmHandler:
             yield event.plain_result("你不在任何秘境中。")
             return
 
-        realm_instance = player.get_realm_instance()
-        realm_name = f"{player.get_level(self.config_manager)}修士的试炼" if realm_instance else "未知的秘境"
+        realm_header = player.get_realm_header()
+        realm_name = f"{player.get_level(self.config_manager)}修士的试炼" if realm_header else "未知的秘境"
 
         player.realm_id = None
         player.realm_floor = 0
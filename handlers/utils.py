@@ -5,6 +5,7 @@ from functools import wraps
 from typing import Callable, Coroutine, AsyncGenerator
 
 from astrbot.api.event import AstrMessageEvent
+from ..core import KeyedLock
 from ..models import Player
 
 CMD_END_CULTIVATION = "出关"
@@ -13,10 +14,14 @@ CMD_CHECK_IN = "签到"
 CMD_PLAYER_INFO = "我的信息"
 CMD_MY_EQUIPMENT = "我的装备" 
 CMD_BACKPACK = "我的背包"
+CMD_MY_RANK = "我的排名"
 
 # 其他指令
 CMD_START_XIUXIAN = "我要修仙"
 
+# 同一玩家的指令串行执行，避免两条指令基于同一份旧数据写回而互相覆盖
+player_locks = KeyedLock()
+
 
 def player_required(func: Callable[..., Coroutine[any, any, AsyncGenerator[any, None]]]):
     """
@@ -26,37 +31,44 @@ def player_required(func: Callable[..., Coroutine[any, any, AsyncGenerator[any,
     @wraps(func)
     async def wrapper(self, event: AstrMessageEvent, *args, **kwargs):
         # self 是 Handler 类的实例 (e.g., PlayerHandler)
-        player = await self.db.get_player_by_id(event.get_sender_id())
-        
-        if not player:
-            yield event.plain_result(f"道友尚未踏入仙途，请发送「{CMD_START_XIUXIAN}」开启你的旅程。")
-            return
-
-        # 状态检查
-        if player.state != "空闲":
-            # 允许特定指令在非空闲时执行
-            allowed_commands = [
-                CMD_END_CULTIVATION, 
-                CMD_LEAVE_REALM,
-                CMD_CHECK_IN,
-                CMD_PLAYER_INFO,
-                CMD_MY_EQUIPMENT,
-                CMD_BACKPACK
-            ]
-            message_text = event.get_message_str().strip()
-            
-            is_allowed = False
-            for cmd in allowed_commands:
-                if message_text.startswith(cmd):
-                    is_allowed = True
-                    break
-            
-            if not is_allowed:
-                yield event.plain_result(f"道友当前正在「{player.state}」中，无法分心他顾。")
+        user_id = event.get_sender_id()
+        # 在锁内读取玩家，保证拿到的是上一条指令写回后的数据
+        async with player_locks.hold(user_id):
+            player = await self.db.get_player_by_id(user_id)
+
+            if not player:
+                yield event.plain_result(f"道友尚未踏入仙途，请发送「{CMD_START_XIUXIAN}」开启你的旅程。")
                 return
 
-        # 将 player 对象作为第一个参数传递给原始函数
-        async for result in func(self, player, event, *args, **kwargs):
-            yield result
+            # 记录最新的群昵称供排行榜展示，只存内存、不写库
+            self.db.leaderboard.set_name(player.user_id, event.get_sender_name())
+
+            # 状态检查
+            if player.state != "空闲":
+                # 允许特定指令在非空闲时执行
+                allowed_commands = [
+                    CMD_END_CULTIVATION, 
+                    CMD_LEAVE_REALM,
+                    CMD_CHECK_IN,
+                    CMD_PLAYER_INFO,
+                    CMD_MY_EQUIPMENT,
+                    CMD_BACKPACK,
+                    CMD_MY_RANK
+                ]
+                message_text = event.get_message_str().strip()
+                
+                is_allowed = False
+                for cmd in allowed_commands:
+                    if message_text.startswith(cmd):
+                        is_allowed = True
+                        break
+                
+                if not is_allowed:
+                    yield event.plain_result(f"道友当前正在「{player.state}」中，无法分心他顾。")
+                    return
+
+            # 将 player 对象作为第一个参数传递给原始函数
+            async for result in func(self, player, event, *args, **kwargs):
+                yield result
             
     return wrapper
\ No newline at end of file
@@ -1,9 +1,14 @@
 from pathlib import Path
+from typing import Dict, List, Tuple
 from astrbot.api import logger, AstrBotConfig
-from astrbot.api.star import Context, Star, register
-from astrbot.api.event import AstrMessageEvent, filter
+from astrbot.api.star import Context, Star, register, StarTools
+from astrbot.api.event import AstrMessageEvent, MessageChain, filter
 from .data import DataBase, MigrationManager
 from .config_manager import ConfigManager
+from .core import WorldBossState, Metrics, BossScheduler
+from .core.metrics import timed_command
+from .core.combat_manager import MonsterGenerator
+from .models import ActiveWorldBoss, Boss
 from .handlers import (
     MiscHandler, PlayerHandler, ShopHandler, SectHandler, CombatHandler, RealmHandler,
     EquipmentHandler
@@ -32,6 +37,10 @@ CMD_FIGHT_BOSS = "讨伐boss"
 CMD_ENTER_REALM = "探索秘境"
 CMD_REALM_ADVANCE = "前进"
 CMD_LEAVE_REALM = "离开秘境"
+CMD_LEADERBOARD = "修仙排行"
+CMD_MY_RANK = "我的排名"
+CMD_RELOAD_CONFIG = "重载修仙配置"
+CMD_STATUS = "修仙状态"
 
 # 装备相关指令
 CMD_UNEQUIP = "卸下"
@@ -49,22 +58,40 @@ class XiuXianPlugin(Star):
         super().__init__(context)
         self.config = config
         _current_dir = Path(__file__).parent
-        self.config_manager = ConfigManager(_current_dir)
+        self.config_manager = ConfigManager(_current_dir, StarTools.get_data_dir("xiuxian"))
+        # 预热秘境Boss所用的强度系数，使常用组合都在快照构建时算好
+        realm_boss_scaling = self.config.get("REALM_RULES", {}).get("REALM_BOSS_SCALING_FACTOR", 1.0)
+        self.config_manager.add_derived_builder(
+            MonsterGenerator.TEMPLATE_CACHE_KEY,
+            lambda snapshot: MonsterGenerator.build_template_cache(snapshot, (1.0, realm_boss_scaling)),
+            signature=f"scaling={(1.0, realm_boss_scaling)!r}"
+        )
+        self.config_manager.add_derived_builder(
+            MonsterGenerator.WORLD_BOSS_CACHE_KEY, MonsterGenerator.build_world_boss_cache, signature="levels=all"
+        )
         
         files_config = self.config.get("FILES", {})
         db_file = files_config.get("DATABASE_FILE", "xiuxian_data.db")
-        self.db = DataBase(db_file)
+        self.db = DataBase(db_file, self.config)
+        perf_config = self.config.get("PERFORMANCE", {})
+        self.metrics = Metrics(perf_config.get("METRICS_ENABLED", False), perf_config.get("METRICS_SAMPLE_SIZE", 512))
+        self.metrics.instrument_database(self.db)
+        self.boss_state = WorldBossState(self.db, perf_config.get("WORLD_BOSS_PERSIST_INTERVAL", 5.0))
+        self.boss_scheduler = BossScheduler(self.db, self.boss_state, self.config, self.config_manager, self.db.leaderboard)
 
-        self.misc_handler = MiscHandler(self.db)
+        self.misc_handler = MiscHandler(self.db, self.config_manager, self.metrics)
         self.player_handler = PlayerHandler(self.db, self.config, self.config_manager)
         self.shop_handler = ShopHandler(self.db, self.config_manager, self.config) # 传入config
         self.sect_handler = SectHandler(self.db, self.config, self.config_manager)
-        self.combat_handler = CombatHandler(self.db, self.config, self.config_manager)
+        self.combat_handler = CombatHandler(self.db, self.config, self.config_manager, self.boss_state, self.boss_scheduler)
         self.realm_handler = RealmHandler(self.db, self.config, self.config_manager)
         self.equipment_handler = EquipmentHandler(self.db, self.config_manager)
 
         access_control_config = self.config.get("ACCESS_CONTROL", {})
         self.whitelist_groups = [str(g) for g in access_control_config.get("WHITELIST_GROUPS", [])]
+        self.announce_boss_spawns = self.config.get("VALUES", {}).get("WORLD_BOSS_SPAWN_ANNOUNCE", False)
+        # 群号 -> 会话标识，记录用过本插件的（白名单）群，用于主动推送世界Boss刷新公告
+        self._announce_targets: Dict[str, str] = {}
         
         logger.info("【修仙插件】XiuXianPlugin __init__ 方法成功执行完毕。")
 
@@ -77,6 +104,7 @@ class XiuXianPlugin(Star):
         """
         # 如果没有配置白名单，允许所有访问
         if not self.whitelist_groups:
+            self._remember_announce_target(event)
             return True
         
         # 获取群组ID，私聊时为None
@@ -88,9 +116,31 @@ class XiuXianPlugin(Star):
             
         # 检查群组是否在白名单中
         if str(group_id) in self.whitelist_groups:
+            self._remember_announce_target(event)
             return True
         
         return False
+
+    def _remember_announce_target(self, event: AstrMessageEvent):
+        group_id = event.get_group_id()
+        if self.announce_boss_spawns and group_id:
+            self._announce_targets[str(group_id)] = event.unified_msg_origin
+
+    async def _announce_spawned_bosses(self, spawned: List[Tuple[ActiveWorldBoss, Boss]]):
+        """向记录的群推送世界Boss刷新公告"""
+        if not self._announce_targets:
+            return
+        lines = ["【天地异变】世界Boss现世！"]
+        for instance, template in spawned:
+            if template:
+                lines.append(f"【{template.name}】 (ID: {instance.boss_id}) ❤️生命: {instance.max_hp}")
+        lines.append(f"使用「{CMD_FIGHT_BOSS} <Boss ID>」发起挑战！")
+        message = MessageChain().message("\n".join(lines))
+        for group_id, origin in list(self._announce_targets.items()):
+            try:
+                await self.context.send_message(origin, message)
+            except Exception as e:
+                logger.warning(f"向群 {group_id} 推送世界Boss公告失败: {e}")
     
     async def _send_access_denied_message(self, event: AstrMessageEvent):
         """发送访问被拒绝的提示消息"""
@@ -104,13 +154,29 @@ class XiuXianPlugin(Star):
         await self.db.connect()
         migration_manager = MigrationManager(self.db.conn, self.config_manager)
         await migration_manager.migrate()
+        await self.db.verify_query_plans()
+        await self.db.rebuild_leaderboard()
+        await self.boss_state.load()
+        self.boss_state.start()
+        await self.boss_scheduler.load()
+        self.boss_scheduler.start(self._announce_spawned_bosses if self.announce_boss_spawns else None)
+        self.config_manager.start_watching(self.config.get("FILES", {}).get("CONFIG_WATCH_INTERVAL", 5.0))
+        self.metrics.start_logging(self.config.get("PERFORMANCE", {}).get("METRICS_LOG_INTERVAL", 0))
         logger.info("修仙插件已加载。")
 
     async def terminate(self):
+        await self.config_manager.stop_watching()
+        await self.metrics.stop_logging()
+        await self.combat_handler.battle_manager.drain_raids()
+        await self.boss_scheduler.stop()
+        await self.boss_state.stop()
+        # 延迟写入模式下，卸载前必须把内存中的玩家数据全部落盘
+        await self.db.flush_pending_players()
         await self.db.close()
         logger.info("修仙插件已卸载。")
         
     @filter.command(CMD_HELP, "显示帮助信息")
+    @timed_command(CMD_HELP)
     async def handle_help(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -118,6 +184,7 @@ class XiuXianPlugin(Star):
         async for r in self.misc_handler.handle_help(event): yield r
         
     @filter.command(CMD_START_XIUXIAN, "开始你的修仙之路")
+    @timed_command(CMD_START_XIUXIAN)
     async def handle_start_xiuxian(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -125,6 +192,7 @@ class XiuXianPlugin(Star):
         async for r in self.player_handler.handle_start_xiuxian(event): yield r
         
     @filter.command(CMD_PLAYER_INFO, "查看你的角色信息")
+    @timed_command(CMD_PLAYER_INFO)
     async def handle_player_info(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -132,6 +200,7 @@ class XiuXianPlugin(Star):
         async for r in self.player_handler.handle_player_info(event): yield r
         
     @filter.command(CMD_CHECK_IN, "每日签到领取奖励")
+    @timed_command(CMD_CHECK_IN)
     async def handle_check_in(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -139,6 +208,7 @@ class XiuXianPlugin(Star):
         async for r in self.player_handler.handle_check_in(event): yield r
         
     @filter.command(CMD_START_CULTIVATION, "开始闭关修炼")
+    @timed_command(CMD_START_CULTIVATION)
     async def handle_start_cultivation(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -146,6 +216,7 @@ class XiuXianPlugin(Star):
         async for r in self.player_handler.handle_start_cultivation(event): yield r
         
     @filter.command(CMD_END_CULTIVATION, "结束闭关修炼")
+    @timed_command(CMD_END_CULTIVATION)
     async def handle_end_cultivation(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -153,13 +224,31 @@ class XiuXianPlugin(Star):
         async for r in self.player_handler.handle_end_cultivation(event): yield r
         
     @filter.command(CMD_BREAKTHROUGH, "尝试突破当前境界")
+    @timed_command(CMD_BREAKTHROUGH)
     async def handle_breakthrough(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
             return
         async for r in self.player_handler.handle_breakthrough(event): yield r
         
+    @filter.command(CMD_LEADERBOARD, "查看修仙排行榜")
+    @timed_command(CMD_LEADERBOARD)
+    async def handle_leaderboard(self, event: AstrMessageEvent):
+        if not self._check_access(event): 
+            await self._send_access_denied_message(event)
+            return
+        async for r in self.player_handler.handle_leaderboard(event): yield r
+        
+    @filter.command(CMD_MY_RANK, "查看自己的排名")
+    @timed_command(CMD_MY_RANK)
+    async def handle_my_rank(self, event: AstrMessageEvent):
+        if not self._check_access(event): 
+            await self._send_access_denied_message(event)
+            return
+        async for r in self.player_handler.handle_my_rank(event): yield r
+        
     @filter.command(CMD_REROLL_SPIRIT_ROOT, "花费灵石，重置灵根")
+    @timed_command(CMD_REROLL_SPIRIT_ROOT)
     async def handle_reroll_spirit_root(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -167,6 +256,7 @@ class XiuXianPlugin(Star):
         async for r in self.player_handler.handle_reroll_spirit_root(event): yield r
         
     @filter.command(CMD_SHOP, "查看坊市商品")
+    @timed_command(CMD_SHOP)
     async def handle_shop(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -174,6 +264,7 @@ class XiuXianPlugin(Star):
         async for r in self.shop_handler.handle_shop(event): yield r
         
     @filter.command(CMD_BACKPACK, "查看你的背包")
+    @timed_command(CMD_BACKPACK)
     async def handle_backpack(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -181,6 +272,7 @@ class XiuXianPlugin(Star):
         async for r in self.shop_handler.handle_backpack(event): yield r
         
     @filter.command(CMD_BUY, "购买物品")
+    @timed_command(CMD_BUY)
     async def handle_buy(self, event: AstrMessageEvent, item_name: str, quantity: int = 1):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -188,6 +280,7 @@ class XiuXianPlugin(Star):
         async for r in self.shop_handler.handle_buy(event, item_name, quantity): yield r
         
     @filter.command(CMD_USE_ITEM, "使用背包中的物品")
+    @timed_command(CMD_USE_ITEM)
     async def handle_use(self, event: AstrMessageEvent, item_name: str, quantity: int = 1):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -195,6 +288,7 @@ class XiuXianPlugin(Star):
         async for r in self.shop_handler.handle_use(event, item_name, quantity): yield r
         
     @filter.command(CMD_CREATE_SECT, "创建你的宗门")
+    @timed_command(CMD_CREATE_SECT)
     async def handle_create_sect(self, event: AstrMessageEvent, sect_name: str):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -202,6 +296,7 @@ class XiuXianPlugin(Star):
         async for r in self.sect_handler.handle_create_sect(event, sect_name): yield r
         
     @filter.command(CMD_JOIN_SECT, "加入一个宗门")
+    @timed_command(CMD_JOIN_SECT)
     async def handle_join_sect(self, event: AstrMessageEvent, sect_name: str):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -209,6 +304,7 @@ class XiuXianPlugin(Star):
         async for r in self.sect_handler.handle_join_sect(event, sect_name): yield r
         
     @filter.command(CMD_LEAVE_SECT, "退出当前宗门")
+    @timed_command(CMD_LEAVE_SECT)
     async def handle_leave_sect(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -216,6 +312,7 @@ class XiuXianPlugin(Star):
         async for r in self.sect_handler.handle_leave_sect(event): yield r
         
     @filter.command(CMD_MY_SECT, "查看我的宗门信息")
+    @timed_command(CMD_MY_SECT)
     async def handle_my_sect(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -223,6 +320,7 @@ class XiuXianPlugin(Star):
         async for r in self.sect_handler.handle_my_sect(event): yield r
         
     @filter.command(CMD_SPAR, "与其他玩家切磋")
+    @timed_command(CMD_SPAR)
     async def handle_spar(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -230,6 +328,7 @@ class XiuXianPlugin(Star):
         async for r in self.combat_handler.handle_spar(event): yield r
         
     @filter.command(CMD_BOSS_LIST, "查看当前所有世界Boss")
+    @timed_command(CMD_BOSS_LIST)
     async def handle_boss_list(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -237,6 +336,7 @@ class XiuXianPlugin(Star):
         async for r in self.combat_handler.handle_boss_list(event): yield r
         
     @filter.command(CMD_FIGHT_BOSS, "讨伐指定ID的世界Boss")
+    @timed_command(CMD_FIGHT_BOSS)
     async def handle_fight_boss(self, event: AstrMessageEvent, boss_id: str):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -244,6 +344,7 @@ class XiuXianPlugin(Star):
         async for r in self.combat_handler.handle_fight_boss(event, boss_id): yield r
         
     @filter.command(CMD_ENTER_REALM, "根据当前境界，探索一个随机秘境")
+    @timed_command(CMD_ENTER_REALM)
     async def handle_enter_realm(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -251,6 +352,7 @@ class XiuXianPlugin(Star):
         async for r in self.realm_handler.handle_enter_realm(event): yield r
         
     @filter.command(CMD_REALM_ADVANCE, "在秘境中前进")
+    @timed_command(CMD_REALM_ADVANCE)
     async def handle_realm_advance(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -258,6 +360,7 @@ class XiuXianPlugin(Star):
         async for r in self.realm_handler.handle_realm_advance(event): yield r
         
     @filter.command(CMD_LEAVE_REALM, "离开当前秘境")
+    @timed_command(CMD_LEAVE_REALM)
     async def handle_leave_realm(self, event: AstrMessageEvent):
         if not self._check_access(event): 
             await self._send_access_denied_message(event)
@@ -266,6 +369,7 @@ class XiuXianPlugin(Star):
 
     # --- 装备指令 ---
     @filter.command(CMD_UNEQUIP, "卸下一件装备")
+    @timed_command(CMD_UNEQUIP)
     async def handle_unequip(self, event: AstrMessageEvent, subtype_name: str):
         if not self._check_access(event):
             await self._send_access_denied_message(event)
@@ -273,8 +377,21 @@ class XiuXianPlugin(Star):
         async for r in self.equipment_handler.handle_unequip(event, subtype_name): yield r
 
     @filter.command(CMD_MY_EQUIPMENT, "查看当前装备")
+    @timed_command(CMD_MY_EQUIPMENT)
     async def handle_my_equipment(self, event: AstrMessageEvent):
         if not self._check_access(event):
             await self._send_access_denied_message(event)
             return
-        async for r in self.equipment_handler.handle_my_equipment(event): yield r
\ No newline at end of file
+        async for r in self.equipment_handler.handle_my_equipment(event): yield r
+
+    # --- 管理指令 ---
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command(CMD_RELOAD_CONFIG, "重新加载修仙数据文件（管理员）")
+    @timed_command(CMD_RELOAD_CONFIG)
+    async def handle_reload_config(self, event: AstrMessageEvent):
+        async for r in self.misc_handler.handle_reload_config(event): yield r
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command(CMD_STATUS, "查看指令与数据库耗时统计（管理员）")
+    async def handle_status(self, event: AstrMessageEvent):
+        async for r in self.misc_handler.handle_status(event): yield r
@@ -1,11 +1,11 @@
 # models.py
 
-import json
-from dataclasses import dataclass, field, replace, asdict
-from typing import Optional, List, Dict, Any, TYPE_CHECKING
+from dataclasses import dataclass, field, fields, replace
+from typing import Optional, List, Dict, Any, Set, Union, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from .config_manager import ConfigManager
+    from .realm_codec import RealmHeader
 
 @dataclass
 class Item:
@@ -56,13 +56,30 @@ class Player:
     defense: int = 5
     realm_id: Optional[str] = None
     realm_floor: int = 0
-    realm_data: Optional[str] = None
+    realm_data: Optional[Union[bytes, str]] = None  # realm_codec 编码；旧数据为 JSON 文本
     
     # 装备槽位
     equipped_weapon: Optional[str] = None
     equipped_armor: Optional[str] = None
     equipped_accessory: Optional[str] = None
 
+    def __post_init__(self):
+        # 记录自加载（或上次落盘）以来被修改过的列，供数据库只写入变化的列
+        object.__setattr__(self, "_dirty_fields", set())
+
+    def __setattr__(self, name: str, value: Any):
+        dirty = self.__dict__.get("_dirty_fields")
+        if dirty is not None and name in PLAYER_COLUMNS and self.__dict__.get(name) != value:
+            dirty.add(name)
+        object.__setattr__(self, name, value)
+
+    @property
+    def dirty_fields(self) -> Set[str]:
+        return self._dirty_fields
+
+    def mark_clean(self):
+        self._dirty_fields.clear()
+
     def get_level(self, config_manager: "ConfigManager") -> str:
         if 0 <= self.level_index < len(config_manager.level_data):
             return config_manager.level_data[self.level_index]["level_name"]
@@ -89,24 +106,31 @@ class Player:
         return stats
 
     def get_realm_instance(self) -> Optional[RealmInstance]:
-        if not self.realm_data:
-            return None
-        try:
-            data = json.loads(self.realm_data)
-            floors = [FloorEvent(**f) for f in data.get("floors", [])]
-            data["floors"] = floors
-            return RealmInstance(**data)
-        except (json.JSONDecodeError, TypeError):
-            return None
+        from .realm_codec import decode_realm
+        return decode_realm(self.realm_data)
+
+    def get_realm_header(self) -> Optional["RealmHeader"]:
+        from .realm_codec import read_header
+        return read_header(self.realm_data)
+
+    def get_realm_floor(self, index: int) -> Optional[FloorEvent]:
+        from .realm_codec import decode_floor
+        return decode_floor(self.realm_data, index)
 
     def set_realm_instance(self, instance: Optional[RealmInstance]):
         if instance is None:
             self.realm_data = None
         else:
-            self.realm_data = json.dumps(asdict(instance))
+            from .realm_codec import encode_realm
+            self.realm_data = encode_realm(instance)
 
     def clone(self) -> "Player":
-        return replace(self)
+        # 副本沿用原对象的脏列集合，避免克隆前的修改在写库时被遗漏
+        new_player = replace(self)
+        new_player._dirty_fields.update(self._dirty_fields)
+        return new_player
+
+PLAYER_COLUMNS = frozenset(f.name for f in fields(Player))
 
 @dataclass
 class PlayerEffect:
@@ -0,0 +1,189 @@
+# realm_codec.py
+
+import json
+import struct
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from .models import FloorEvent, RealmInstance
+
+# 二进制秘境编码（v1）
+#   头部   : 魔数 b"RLM" | 版本 u8 | 总层数 u16 | 楼层记录数 u16 | 字符串表偏移 u32
+#   楼层区 : 每层固定 5 字节 <类型码 u8, 载荷 u32>
+#            怪物/Boss 的载荷为字符串表下标，宝箱的载荷为灵石数，
+#            无法紧凑表示的事件以 JSON 存入字符串表，载荷为其下标
+#   字符串表: 条目数 u16，随后每条 <长度 u16, UTF-8 字节>；第 0 条为秘境ID
+# 固定宽度的楼层记录使读取任意一层只需一次 unpack_from，无需解析整个秘境。
+#
+# 种子秘境编码（v2）不保存楼层，楼层由 RealmGenerator 按种子即时推导
+#   魔数 b"RLM" | 版本 u8 | 种子 u64 | 境界 u16 | 配置指纹 u32 | 总层数 u16 | 秘境ID <长度 u16, UTF-8>
+
+MAGIC = b"RLM"
+CODEC_VERSION = 1
+SEEDED_CODEC_VERSION = 2
+
+_HEADER = struct.Struct("<3sBHHI")
+_SEEDED_HEADER = struct.Struct("<3sBQHIH")
+_FLOOR = struct.Struct("<BI")
+_U16 = struct.Struct("<H")
+
+_TYPE_MONSTER = 1
+_TYPE_TREASURE = 2
+_TYPE_BOSS = 3
+_TYPE_JSON = 255
+
+_U32_MAX = 0xFFFFFFFF
+
+RealmData = Union[str, bytes, None]
+
+class RealmHeader(NamedTuple):
+    """秘境编码的头部信息；种子秘境的 floor_count 为 0 且 seed 不为 None"""
+
+    id: str
+    total_floors: int
+    floor_count: int
+    seed: Optional[int] = None
+    level_index: int = 0
+    fingerprint: int = 0
+
+def _pack_floor(event: FloorEvent, intern) -> bytes:
+    if event.type in ("monster", "boss") and set(event.data) == {"id"}:
+        code = _TYPE_MONSTER if event.type == "monster" else _TYPE_BOSS
+        return _FLOOR.pack(code, intern(str(event.data["id"])))
+    if event.type == "treasure" and set(event.data) == {"rewards"}:
+        rewards = event.data["rewards"]
+        gold = rewards.get("gold") if isinstance(rewards, dict) and set(rewards) == {"gold"} else None
+        if isinstance(gold, int) and 0 <= gold <= _U32_MAX:
+            return _FLOOR.pack(_TYPE_TREASURE, gold)
+    # 其他事件保持原样，保证编码无损
+    payload = json.dumps({"type": event.type, "data": event.data}, ensure_ascii=False, separators=(",", ":"))
+    return _FLOOR.pack(_TYPE_JSON, intern(payload))
+
+def encode_realm(instance: RealmInstance) -> bytes:
+    strings: List[str] = [instance.id]
+    index: Dict[str, int] = {instance.id: 0}
+
+    def intern(value: str) -> int:
+        i = index.get(value)
+        if i is None:
+            i = index[value] = len(strings)
+            strings.append(value)
+        return i
+
+    floor_bytes = b"".join(_pack_floor(f, intern) for f in instance.floors)
+
+    table = [_U16.pack(len(strings))]
+    for s in strings:
+        raw = s.encode("utf-8")
+        table.append(_U16.pack(len(raw)))
+        table.append(raw)
+
+    string_offset = _HEADER.size + len(floor_bytes)
+    header = _HEADER.pack(MAGIC, CODEC_VERSION, instance.total_floors, len(instance.floors), string_offset)
+    return header + floor_bytes + b"".join(table)
+
+def encode_seeded_realm(realm_id: str, seed: int, level_index: int, fingerprint: int, total_floors: int) -> bytes:
+    raw_id = realm_id.encode("utf-8")
+    return _SEEDED_HEADER.pack(MAGIC, SEEDED_CODEC_VERSION, seed, level_index, fingerprint, total_floors) + \
+        _U16.pack(len(raw_id)) + raw_id
+
+def _read_seeded_header(data: bytes) -> RealmHeader:
+    _, _, seed, level_index, fingerprint, total_floors = _SEEDED_HEADER.unpack_from(data, 0)
+    (length,) = _U16.unpack_from(data, _SEEDED_HEADER.size)
+    start = _SEEDED_HEADER.size + _U16.size
+    realm_id = bytes(data[start:start + length]).decode("utf-8")
+    return RealmHeader(realm_id, total_floors, 0, seed, level_index, fingerprint)
+
+def _codec_version(data: bytes) -> int:
+    if bytes(data[:3]) != MAGIC or len(data) < 4:
+        raise ValueError("不是秘境编码数据")
+    return data[3]
+
+def _read_string(data: bytes, string_offset: int, wanted: int) -> str:
+    (count,) = _U16.unpack_from(data, string_offset)
+    if wanted >= count:
+        raise ValueError(f"字符串下标越界: {wanted}")
+    pos = string_offset + _U16.size
+    for _ in range(wanted):
+        (length,) = _U16.unpack_from(data, pos)
+        pos += _U16.size + length
+    (length,) = _U16.unpack_from(data, pos)
+    pos += _U16.size
+    return bytes(data[pos:pos + length]).decode("utf-8")
+
+def _unpack_header(data: bytes) -> Tuple[int, int, int]:
+    magic, version, total_floors, floor_count, string_offset = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != CODEC_VERSION:
+        raise ValueError(f"未知的秘境编码: {magic!r} v{version}")
+    return total_floors, floor_count, string_offset
+
+def _floor_from_record(data: bytes, string_offset: int, code: int, payload: int) -> FloorEvent:
+    if code == _TYPE_MONSTER:
+        return FloorEvent(type="monster", data={"id": _read_string(data, string_offset, payload)})
+    if code == _TYPE_BOSS:
+        return FloorEvent(type="boss", data={"id": _read_string(data, string_offset, payload)})
+    if code == _TYPE_TREASURE:
+        return FloorEvent(type="treasure", data={"rewards": {"gold": payload}})
+    if code == _TYPE_JSON:
+        return FloorEvent(**json.loads(_read_string(data, string_offset, payload)))
+    raise ValueError(f"未知的楼层类型码: {code}")
+
+def _decode_legacy(data: str) -> Optional[RealmInstance]:
+    """解析旧版的 JSON 文本格式"""
+    try:
+        raw: Dict[str, Any] = json.loads(data)
+        raw["floors"] = [FloorEvent(**f) for f in raw.get("floors", [])]
+        return RealmInstance(**raw)
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+def decode_realm(data: RealmData) -> Optional[RealmInstance]:
+    """完整解码一个秘境；兼容旧版 JSON 文本"""
+    if not data:
+        return None
+    if isinstance(data, str):
+        return _decode_legacy(data)
+    try:
+        if _codec_version(data) == SEEDED_CODEC_VERSION:
+            # 种子秘境没有可直接解码的楼层
+            return None
+        total_floors, floor_count, string_offset = _unpack_header(data)
+        floors = [
+            _floor_from_record(data, string_offset, code, payload)
+            for code, payload in _FLOOR.iter_unpack(data[_HEADER.size:string_offset])
+        ]
+        if len(floors) != floor_count:
+            return None
+        return RealmInstance(id=_read_string(data, string_offset, 0), total_floors=total_floors, floors=floors)
+    except (struct.error, ValueError, TypeError):
+        return None
+
+def read_header(data: RealmData) -> Optional[RealmHeader]:
+    """只读取秘境的ID与层数，不解码楼层"""
+    if not data:
+        return None
+    if isinstance(data, str):
+        instance = _decode_legacy(data)
+        return RealmHeader(instance.id, instance.total_floors, len(instance.floors)) if instance else None
+    try:
+        if _codec_version(data) == SEEDED_CODEC_VERSION:
+            return _read_seeded_header(data)
+        total_floors, floor_count, string_offset = _unpack_header(data)
+        return RealmHeader(_read_string(data, string_offset, 0), total_floors, floor_count)
+    except (struct.error, ValueError):
+        return None
+
+def decode_floor(data: RealmData, index: int) -> Optional[FloorEvent]:
+    """按需解码单层事件；下标越界、数据损坏或种子秘境时返回 None"""
+    if not data or index < 0:
+        return None
+    if isinstance(data, str):
+        instance = _decode_legacy(data)
+        return instance.floors[index] if instance and index < len(instance.floors) else None
+    try:
+        _, floor_count, string_offset = _unpack_header(data)
+        if index >= floor_count:
+            return None
+        code, payload = _FLOOR.unpack_from(data, _HEADER.size + index * _FLOOR.size)
+        return _floor_from_record(data, string_offset, code, payload)
+    except (struct.error, ValueError, TypeError):
+        return None
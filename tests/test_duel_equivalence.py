@@ -0,0 +1,102 @@
+# tests/test_duel_equivalence.py
+"""resolve_duel 与原逐回合循环的等价性测试
+
+三个参考函数逐字保留了秘境遇怪、世界Boss讨伐与切磋改写前的回合循环，
+在固定种子的随机网格上与 resolve_duel（加上调用方的后处理）逐项比对。
+"""
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+
+import _bootstrap  # noqa: E402
+
+_bootstrap.install()
+
+from xiuxian.core.combat_manager import resolve_duel  # noqa: E402
+
+CASES = 50_000
+
+def _grid(seed: int):
+    rng = random.Random(seed)
+    for _ in range(CASES):
+        # 同时覆盖一击必杀、刚好整除与打满回合上限的情形
+        yield (rng.randint(1, 2000), rng.randint(1, 300), rng.randint(1, 5000), rng.randint(1, 300))
+
+def _reference_monster(player_hp, damage_to_monster, monster_hp, damage_to_player):
+    total_damage_dealt = 0
+    total_damage_taken = 0
+    turn = 0
+    while player_hp > 1 and monster_hp > 0:
+        turn += 1
+        monster_hp -= damage_to_monster
+        total_damage_dealt += damage_to_monster
+        if monster_hp <= 0:
+            break
+        player_hp -= damage_to_player
+        total_damage_taken += damage_to_player
+    if player_hp < 1:
+        player_hp = 1
+    return turn, player_hp, monster_hp <= 0, total_damage_dealt, total_damage_taken
+
+def _reference_boss(player_hp, damage, boss_hp, damage_to_player):
+    total_damage_dealt = 0
+    total_damage_taken = 0
+    turn = 0
+    max_turns = 50
+    while player_hp > 1 and boss_hp > 0 and turn < max_turns:
+        turn += 1
+        damage_to_boss = min(damage, boss_hp)
+        boss_hp -= damage_to_boss
+        total_damage_dealt += damage_to_boss
+        if boss_hp <= 0:
+            break
+        player_hp -= damage_to_player
+        total_damage_taken += damage_to_player
+    if player_hp < 1:
+        player_hp = 1
+    return turn, player_hp, boss_hp, total_damage_dealt, total_damage_taken
+
+def _reference_pvp(p1_hp, damage_to_p2, p2_hp, damage_to_p1):
+    p1_damage_dealt = 0
+    p2_damage_dealt = 0
+    turn = 0
+    max_turns = 30
+    while p1_hp > 1 and p2_hp > 1 and turn < max_turns:
+        turn += 1
+        p2_hp -= damage_to_p2
+        p1_damage_dealt += damage_to_p2
+        if p2_hp <= 1:
+            p2_hp = 1
+            break
+        p1_hp -= damage_to_p1
+        p2_damage_dealt += damage_to_p1
+        if p1_hp <= 1:
+            p1_hp = 1
+            break
+    return turn, p1_hp, p2_hp, p1_damage_dealt, p2_damage_dealt
+
+def test_monster_duel_matches_round_loop():
+    for first_hp, first_damage, second_hp, second_damage in _grid(1):
+        outcome = resolve_duel(first_hp, first_damage, second_hp, second_damage)
+        actual = (outcome.turns, max(1, outcome.first_hp), outcome.second_hp <= 0,
+                  outcome.damage_by_first, outcome.damage_by_second)
+        assert actual == _reference_monster(first_hp, first_damage, second_hp, second_damage)
+
+def test_boss_duel_matches_round_loop():
+    for first_hp, first_damage, second_hp, second_damage in _grid(2):
+        outcome = resolve_duel(first_hp, first_damage, second_hp, second_damage, max_turns=50, clamp_overkill=True)
+        actual = (outcome.turns, max(1, outcome.first_hp), outcome.second_hp,
+                  outcome.damage_by_first, outcome.damage_by_second)
+        assert actual == _reference_boss(first_hp, first_damage, second_hp, second_damage)
+
+def test_pvp_duel_matches_round_loop():
+    for first_hp, first_damage, second_hp, second_damage in _grid(3):
+        outcome = resolve_duel(first_hp, first_damage, second_hp, second_damage, second_floor=1, max_turns=30)
+        first_left, second_left = first_hp, second_hp
+        if outcome.turns > 0:
+            first_left, second_left = max(1, outcome.first_hp), max(1, outcome.second_hp)
+        actual = (outcome.turns, first_left, second_left, outcome.damage_by_first, outcome.damage_by_second)
+        assert actual == _reference_pvp(first_hp, first_damage, second_hp, second_damage)
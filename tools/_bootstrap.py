@@ -0,0 +1,118 @@
+# tools/_bootstrap.py
+"""让 tools 下的脚本脱离 AstrBot 直接导入插件内的模块。
+
+插件目录本身不是常规包（由 AstrBot 按目录加载），这里以固定别名
+``xiuxian`` 注册一个指向插件根目录的包对象，之后即可 ``import xiuxian.xxx``。
+未安装 AstrBot 时，为 ``astrbot.api`` 提供日志、配置类型、数据目录、指令装饰器与
+消息组件的最小替身，足以导入 main.py 并直接调用指令处理函数；数据目录指向临时目录。
+"""
+
+import json
+import logging
+import sys
+import tempfile
+import types
+from pathlib import Path
+
+PLUGIN_ROOT = Path(__file__).resolve().parent.parent
+PACKAGE_NAME = "xiuxian"
+
+def _install_astrbot_fallback():
+    try:
+        import astrbot.api  # noqa: F401
+        return
+    except ImportError:
+        pass
+    data_root = Path(tempfile.mkdtemp(prefix="xiuxian_tools_"))
+
+    class StarTools:
+        @staticmethod
+        def get_data_dir(name: str) -> Path:
+            path = data_root / name
+            path.mkdir(parents=True, exist_ok=True)
+            return path
+
+    class Star:
+        def __init__(self, context):
+            self.context = context
+
+    class EventFilter:
+        # 只保留被装饰的函数本身，指令注册由 AstrBot 负责
+        class PermissionType:
+            ADMIN = "admin"
+            MEMBER = "member"
+
+        @staticmethod
+        def command(*args, **kwargs):
+            return lambda func: func
+
+        @staticmethod
+        def permission_type(*args, **kwargs):
+            return lambda func: func
+
+    class MessageChain:
+        def __init__(self):
+            self.chain = []
+
+        def message(self, text: str):
+            self.chain.append(text)
+            return self
+
+    class At:
+        def __init__(self, qq, name=None):
+            self.qq = qq
+            self.name = name
+
+    modules = {name: types.ModuleType(name) for name in (
+        "astrbot", "astrbot.api", "astrbot.api.star", "astrbot.api.event",
+        "astrbot.core", "astrbot.core.message", "astrbot.core.message.components",
+    )}
+    for name, module in modules.items():
+        module.__path__ = []
+        parent, _, child = name.rpartition(".")
+        if parent:
+            setattr(modules[parent], child, module)
+        sys.modules[name] = module
+
+    api = modules["astrbot.api"]
+    api.logger = logging.getLogger("xiuxian.tools")
+    api.AstrBotConfig = dict
+    star = modules["astrbot.api.star"]
+    star.StarTools = StarTools
+    star.Context = object
+    star.Star = Star
+    star.register = lambda *args, **kwargs: (lambda cls: cls)
+    event = modules["astrbot.api.event"]
+    event.AstrMessageEvent = object
+    event.MessageChain = MessageChain
+    event.filter = EventFilter
+    modules["astrbot.core.message.components"].At = At
+
+def install() -> str:
+    _install_astrbot_fallback()
+    if PACKAGE_NAME not in sys.modules:
+        package = types.ModuleType(PACKAGE_NAME)
+        package.__path__ = [str(PLUGIN_ROOT)]
+        sys.modules[PACKAGE_NAME] = package
+    return PACKAGE_NAME
+
+def _schema_defaults(schema: dict) -> dict:
+    result = {}
+    for key, spec in schema.items():
+        if spec.get("type") == "object":
+            result[key] = _schema_defaults(spec.get("items", {}))
+        elif "default" in spec:
+            result[key] = spec["default"]
+    return result
+
+def default_plugin_config(overrides: Path = None) -> dict:
+    """按 _conf_schema.json 的默认值构造插件配置，可用 JSON 文件覆盖部分配置项"""
+    schema = json.loads((PLUGIN_ROOT / "_conf_schema.json").read_text(encoding="utf-8"))
+    config = _schema_defaults(schema)
+    if overrides:
+        for section, values in json.loads(Path(overrides).read_text(encoding="utf-8")).items():
+            if isinstance(values, dict):
+                config.setdefault(section, {}).update(values)
+            else:
+                config[section] = values
+    return config
@@ -0,0 +1,274 @@
+# tools/balance_simulator.py
+"""离线数值平衡模拟器（蒙特卡洛，NumPy 批量随机数）。
+
+直接读取插件的真实数据文件（config/*.json）与 _conf_schema.json 默认配置，
+无需 AstrBot 与数据库。按境界统计：
+  * 秘境：通关率、平均推进层数、每次净灵石/修为/掉落价值、每小时收益
+  * 世界Boss：满血单次讨伐伤害占Boss血量的比例、单人击杀所需次数
+  * 闭关+突破：升到下一境界所需时间的分布（p50/p90），以及从零开始的累计时间
+
+怪物属性、Boss强度系数、掉落表与境界基础属性均复用插件代码
+（MonsterGenerator、RealmGenerator、CultivationManager），战斗规则与 resolve_duel 一致，
+启动时会抽样核对批量结算与 resolve_duel / handle_breakthrough 的结果。
+玩家按无装备的境界基础属性计算，闭关按连续修炼、修为攒够即尝试突破估算。
+
+用法: python tools/balance_simulator.py [--runs N] [--levels A-B] [--config overrides.json]
+依赖: numpy
+"""
+
+import argparse
+import random
+import sys
+import time
+from typing import Dict, List, NamedTuple, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    sys.exit("balance_simulator 需要 numpy，请先执行 pip install numpy")
+
+import _bootstrap
+
+_bootstrap.install()
+
+from xiuxian.config_manager import ConfigManager  # noqa: E402
+from xiuxian.core.combat_manager import MonsterGenerator, resolve_duel  # noqa: E402
+from xiuxian.core.cultivation_manager import CultivationManager  # noqa: E402
+from xiuxian.core.realm_manager import RealmGenerator  # noqa: E402
+from xiuxian.models import Player  # noqa: E402
+
+class EnemyTable(NamedTuple):
+    """某一境界下一组敌人模板的属性数组（下标与模板列表一致）"""
+
+    hp: np.ndarray
+    attack: np.ndarray
+    defense: np.ndarray
+    gold: np.ndarray
+    experience: np.ndarray
+    loot: list  # 每个模板的 LootTable
+
+def duel_batch(first_hp: np.ndarray, first_damage: np.ndarray,
+               second_hp: np.ndarray, second_damage: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """resolve_duel(first_floor=1, second_floor=0) 的向量化版本，返回 (先手剩余生命, 是否击败后手)"""
+    active = (first_hp > 1) & (second_hp > 0)
+    hits_to_defeat_second = -(-second_hp // first_damage)
+    hits_to_defeat_first = -(-(first_hp - 1) // second_damage)
+    won = hits_to_defeat_second <= hits_to_defeat_first
+    second_hits = np.where(won, hits_to_defeat_second - 1, hits_to_defeat_first)
+    remaining = np.where(active, first_hp - second_hits * second_damage, first_hp)
+    defeated = np.where(active, won, second_hp <= 0)
+    return remaining, defeated
+
+class BalanceSimulator:
+    def __init__(self, config: dict, config_manager: ConfigManager, seed: int = 0, advance_seconds: float = 30.0):
+        self.config = config
+        self.config_manager = config_manager
+        self.cultivation = CultivationManager(config, config_manager)
+        self.rng = np.random.default_rng(seed)
+        self.advance_seconds = advance_seconds
+        self.monster_ids = list(config_manager.monster_data.keys())
+        self.boss_ids = list(config_manager.boss_data.keys())
+        self.item_prices = {item_id: item.price for item_id, item in config_manager.item_data.items()}
+
+    # --- 复用插件规则 ---
+
+    def player_stats(self, level_index: int) -> Dict[str, int]:
+        return self.cultivation._calculate_base_stats(level_index)
+
+    def enemy_table(self, kind: str, level_index: int, scaling_factor: float = 1.0) -> EnemyTable:
+        ids = self.boss_ids if kind == "boss" else self.monster_ids
+        stats = [MonsterGenerator._get_template(kind, i, level_index, self.config_manager, scaling_factor) for i in ids]
+        return EnemyTable(
+            hp=np.array([s.hp for s in stats], dtype=np.int64),
+            attack=np.array([s.attack for s in stats], dtype=np.int64),
+            defense=np.array([s.defense for s in stats], dtype=np.int64),
+            gold=np.array([s.gold for s in stats], dtype=np.int64),
+            experience=np.array([s.experience for s in stats], dtype=np.int64),
+            loot=[s.loot_table for s in stats],
+        )
+
+    def loot_value(self, table: EnemyTable, choice: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """按物品售价估算掉落价值；每个模板的掉落表逐条批量掷骰"""
+        value = np.zeros(len(choice), dtype=np.float64)
+        for template_index, loot in enumerate(table.loot):
+            rows = np.nonzero(mask & (choice == template_index))[0]
+            if len(rows) == 0:
+                continue
+            for chance, item_id, min_qty, max_qty in zip(*loot):
+                dropped = self.rng.random(len(rows)) < chance
+                qty = self.rng.integers(min_qty, max_qty + 1, size=len(rows))
+                value[rows] += dropped * qty * self.item_prices.get(item_id, 0)
+        return value
+
+    # --- 模拟 ---
+
+    def simulate_realm(self, level_index: int, runs: int) -> Dict[str, float]:
+        rules = self.config["REALM_RULES"]
+        total_floors = RealmGenerator._total_floors(level_index, self.config)
+        stats = self.player_stats(level_index)
+        monsters = self.enemy_table("monster", level_index)
+        bosses = self.enemy_table("boss", level_index, rules.get("REALM_BOSS_SCALING_FACTOR", 1.0))
+
+        hp = np.full(runs, stats["hp"], dtype=np.int64)
+        alive = np.ones(runs, dtype=bool)
+        floors_done = np.zeros(runs, dtype=np.int64)
+        gold = np.zeros(runs, dtype=np.float64)
+        exp = np.zeros(runs, dtype=np.float64)
+        loot = np.zeros(runs, dtype=np.float64)
+
+        for floor in range(total_floors):
+            is_boss_floor = floor == total_floors - 1
+            if is_boss_floor:
+                table, fight = bosses, alive.copy()
+            else:
+                table = monsters
+                fight = alive & (self.rng.random(runs) < rules["REALM_MONSTER_CHANCE"])
+                treasure = alive & ~fight
+                gold += treasure * self.rng.integers(50, 151, size=runs) * (1 + level_index)
+
+            choice = self.rng.integers(0, len(table.hp), size=runs)
+            damage_dealt = np.maximum(1, stats["attack"] - table.defense[choice])
+            damage_taken = np.maximum(1, table.attack[choice] - stats["defense"])
+            remaining, won = duel_batch(hp, damage_dealt, table.hp[choice], damage_taken)
+
+            hp = np.where(fight, np.maximum(1, remaining), hp)
+            win = fight & won
+            gold += win * table.gold[choice]
+            exp += win * table.experience[choice]
+            loot += self.loot_value(table, choice, win)
+            # 战败即离开秘境；与 advance_session 一致，战败这一层也计入推进层数
+            floors_done += alive
+            alive &= ~(fight & ~won)
+
+        entry_cost = 50 + level_index * 25
+        hours = floors_done * self.advance_seconds / 3600
+        net_gold = gold - entry_cost
+        return {
+            "clear_rate": float(alive.mean()),
+            "floors": float(floors_done.mean()),
+            "total_floors": total_floors,
+            "gold_per_run": float(net_gold.mean()),
+            "exp_per_run": float(exp.mean()),
+            "loot_per_run": float(loot.mean()),
+            "gold_per_hour": float(net_gold.sum() / hours.sum()),
+            "exp_per_hour": float(exp.sum() / hours.sum()),
+        }
+
+    def simulate_world_boss(self, level_index: int) -> Dict[str, float]:
+        """玩家与Boss同境界、满血讨伐一次（50回合上限），各模板取平均"""
+        stats = self.player_stats(level_index)
+        bosses = self.enemy_table("boss", level_index)
+        shares, attempts = [], []
+        for i in range(len(bosses.hp)):
+            outcome = resolve_duel(stats["hp"], max(1, stats["attack"] - int(bosses.defense[i])),
+                                   int(bosses.hp[i]), max(1, int(bosses.attack[i]) - stats["defense"]),
+                                   max_turns=50, clamp_overkill=True)
+            shares.append(outcome.damage_by_first / bosses.hp[i])
+            attempts.append(-(-int(bosses.hp[i]) // max(1, outcome.damage_by_first)))
+        return {"boss_damage_share": float(np.mean(shares)), "boss_solo_attempts": float(np.mean(attempts))}
+
+    def simulate_progression(self, players: int) -> np.ndarray:
+        """闭关+突破：返回 (境界数-1, players) 的升级耗时矩阵（小时）"""
+        values = self.config["VALUES"]
+        speeds_config = self.config["SPIRIT_ROOT_SPEEDS"]
+        roots = list(self.cultivation.root_to_config_key.values())
+        root_speeds = np.array([speeds_config.get(key, 1.0) for key in roots])
+        exp_per_hour = 60 * values["BASE_EXP_PER_MINUTE"] * root_speeds[self.rng.integers(0, len(roots), size=players)]
+
+        level_data = self.config_manager.level_data
+        hours = np.zeros((max(0, len(level_data) - 1), players))
+        for level_index in range(len(level_data) - 1):
+            target = level_data[level_index + 1]
+            punishment = int(target["exp_needed"] * values["BREAKTHROUGH_FAIL_PUNISHMENT_RATIO"])
+            success_rate = target["success_rate"]
+            failures = self.rng.geometric(success_rate, size=players) - 1 if success_rate > 0 else np.full(players, np.inf)
+            hours[level_index] = (target["exp_needed"] + failures * punishment) / exp_per_hour
+        return hours
+
+    # --- 与插件实现的一致性核对 ---
+
+    def self_check(self, samples: int = 20000):
+        rng = random.Random(1)
+        php = np.array([rng.randint(2, 3000) for _ in range(samples)], dtype=np.int64)
+        pd = np.array([rng.randint(1, 300) for _ in range(samples)], dtype=np.int64)
+        mhp = np.array([rng.randint(1, 5000) for _ in range(samples)], dtype=np.int64)
+        md = np.array([rng.randint(1, 300) for _ in range(samples)], dtype=np.int64)
+        remaining, won = duel_batch(php, pd, mhp, md)
+        for i in range(samples):
+            outcome = resolve_duel(int(php[i]), int(pd[i]), int(mhp[i]), int(md[i]))
+            assert outcome.first_hp == remaining[i] and (outcome.second_hp <= 0) == won[i], "批量战斗结算与 resolve_duel 不一致"
+
+        # 突破：成功扣除所需修为并升级，失败按比例扣除修为
+        level_data = self.config_manager.level_data
+        if len(level_data) > 1:
+            target = level_data[1]
+            player = Player(user_id="sim", experience=target["exp_needed"] * 2)
+            for _ in range(20):
+                _, _, after = self.cultivation.handle_breakthrough(player)
+                if after.level_index == 1:
+                    assert after.experience == player.experience - target["exp_needed"]
+                else:
+                    punishment = int(target["exp_needed"] * self.config["VALUES"]["BREAKTHROUGH_FAIL_PUNISHMENT_RATIO"])
+                    assert after.experience == player.experience - punishment
+
+def parse_levels(text: str, level_count: int) -> range:
+    if not text:
+        return range(level_count)
+    start, _, end = text.partition("-")
+    return range(int(start), int(end or start) + 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=100000, help="每个境界模拟的秘境次数")
+    parser.add_argument("--players", type=int, default=100000, help="模拟修炼进度的玩家数")
+    parser.add_argument("--levels", default="", help="只模拟指定境界下标范围，如 0-10")
+    parser.add_argument("--advance-seconds", type=float, default=30.0, help="假设每次「前进」之间的间隔秒数")
+    parser.add_argument("--config", default=None, help="覆盖插件配置项的 JSON 文件")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = _bootstrap.default_plugin_config(args.config)
+    config_manager = ConfigManager(_bootstrap.PLUGIN_ROOT)
+    # 与插件相同，预先构建秘境Boss所用强度系数下的属性表
+    realm_boss_scaling = config.get("REALM_RULES", {}).get("REALM_BOSS_SCALING_FACTOR", 1.0)
+    config_manager.add_derived_builder(
+        MonsterGenerator.TEMPLATE_CACHE_KEY,
+        lambda snapshot: MonsterGenerator.build_template_cache(snapshot, (1.0, realm_boss_scaling))
+    )
+    simulator = BalanceSimulator(config, config_manager, args.seed, args.advance_seconds)
+    random.seed(args.seed)
+    simulator.self_check()
+
+    level_data = config_manager.level_data
+    levels = parse_levels(args.levels, len(level_data))
+    started = time.perf_counter()
+    progression = simulator.simulate_progression(args.players)
+    cumulative = np.cumsum(progression, axis=0)
+
+    header = (f"{'境界':<8}{'层数':>4}{'通关率':>8}{'推进':>6}{'净灵石/次':>10}{'修为/次':>9}{'掉落/次':>9}"
+              f"{'灵石/时':>9}{'修为/时':>9}{'Boss伤害':>9}{'单刷次数':>8}{'升级p50':>9}{'升级p90':>9}{'累计p50':>9}")
+    print(header)
+    rows: List[str] = []
+    for level_index in levels:
+        realm = simulator.simulate_realm(level_index, args.runs)
+        boss = simulator.simulate_world_boss(level_index)
+        if level_index < len(progression):
+            p50, p90 = np.percentile(progression[level_index], [50, 90])
+            total = np.percentile(cumulative[level_index], 50)
+            progress = f"{p50:>11.1f}h{p90:>11.1f}h{total:>11.1f}h"
+        else:
+            progress = f"{'-':>12}{'-':>12}{'-':>12}"
+        name = level_data[level_index]["level_name"] if level_index < len(level_data) else str(level_index)
+        rows.append(
+            f"{name:<8}{realm['total_floors']:>4}{realm['clear_rate']:>8.1%}{realm['floors']:>6.2f}"
+            f"{realm['gold_per_run']:>10.0f}{realm['exp_per_run']:>9.0f}{realm['loot_per_run']:>9.0f}"
+            f"{realm['gold_per_hour']:>9.0f}{realm['exp_per_hour']:>9.0f}"
+            f"{boss['boss_damage_share']:>9.1%}{boss['boss_solo_attempts']:>8.1f}" + progress
+        )
+        print(rows[-1])
+
+    simulated = args.runs * len(levels)
+    print(f"\n共模拟 {simulated} 次秘境、{args.players} 名玩家的修炼进度，用时 {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
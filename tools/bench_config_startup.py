@@ -0,0 +1,87 @@
+# tools/bench_config_startup.py
+"""对比插件启动时解析配置（冷启动）与载入预编译配置（缓存命中）的耗时。
+
+在临时目录中以 config/ 下的数据为模板放大生成测试配置（默认 10000 件物品、1000 种怪物）。
+用法: python tools/bench_config_startup.py [--items N] [--monsters N] [--rounds N]
+"""
+
+import argparse
+import json
+import logging
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import _bootstrap
+
+_bootstrap.install()
+
+from xiuxian.config_manager import ConfigManager, CONFIG_ARTIFACT_NAME  # noqa: E402
+from xiuxian.core.combat_manager import MonsterGenerator  # noqa: E402
+
+def build_scaled_config(target: Path, items: int, monsters: int):
+    source = _bootstrap.PLUGIN_ROOT / "config"
+    shutil.copytree(source, target / "config")
+    rng = random.Random(7)
+
+    base_items = json.loads((source / "items.json").read_text(encoding="utf-8"))
+    scaled_items = dict(base_items)  # 保留原有物品，掉落表引用仍然有效
+    for i in range(items - len(base_items)):
+        template = dict(rng.choice(list(base_items.values())))
+        template["name"] = f"{template['name']}·{i}"
+        scaled_items[str(100000 + i)] = template
+    (target / "config" / "items.json").write_text(json.dumps(scaled_items, ensure_ascii=False), encoding="utf-8")
+
+    tag_names = list(json.loads((source / "tags.json").read_text(encoding="utf-8")).keys())
+    scaled_monsters = {
+        f"mob_{i}": {"name": f"妖兽{i}", "tags": rng.sample(tag_names, k=min(len(tag_names), rng.randint(1, 3)))}
+        for i in range(monsters)
+    }
+    (target / "config" / "monsters.json").write_text(json.dumps(scaled_monsters, ensure_ascii=False), encoding="utf-8")
+
+def load(base_dir: Path, artifact_dir):
+    cm = ConfigManager(base_dir, artifact_dir)
+    cm.add_derived_builder(
+        MonsterGenerator.TEMPLATE_CACHE_KEY,
+        lambda snapshot: MonsterGenerator.build_template_cache(snapshot, (1.0, 0.7)),
+        signature="scaling=(1.0, 0.7)"
+    )
+    return cm
+
+def measure(func, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--monsters", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir = Path(tmp)
+        artifact_dir = base_dir / "data"
+        build_scaled_config(base_dir, args.items, args.monsters)
+
+        cold_ms = measure(lambda: load(base_dir, None), args.rounds)
+        cm = load(base_dir, artifact_dir)  # 生成预编译文件
+        artifact_size = (artifact_dir / CONFIG_ARTIFACT_NAME).stat().st_size
+        cached_ms = measure(lambda: load(base_dir, artifact_dir), args.rounds)
+
+        templates = sum(len(t.hp) for t in cm.snapshot.derived[MonsterGenerator.TEMPLATE_CACHE_KEY].values())
+        print(f"物品 {len(cm.item_data)} 件，怪物 {len(cm.monster_data)} 种，预计算属性模板 {templates} 个")
+        print(f"冷启动解析: {cold_ms:8.1f} ms")
+        print(f"预编译载入: {cached_ms:8.1f} ms  (文件 {artifact_size / 1024:.0f} KiB)")
+        print(f"加速比: {cold_ms / cached_ms:.1f}x")
+
+if __name__ == "__main__":
+    main()
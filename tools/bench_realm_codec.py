@@ -0,0 +1,77 @@
+# tools/bench_realm_codec.py
+"""对比秘境数据的旧 JSON 格式与二进制编码：每个秘境的存储字节数与每次「前进」的解码耗时。
+
+用法: python tools/bench_realm_codec.py [--floors N] [--realms N]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from dataclasses import asdict
+
+import _bootstrap
+
+_bootstrap.install()
+
+from xiuxian.models import FloorEvent, RealmInstance  # noqa: E402
+from xiuxian.realm_codec import decode_floor, encode_realm, encode_seeded_realm, read_header  # noqa: E402
+
+def make_realm(floors: int, rng: random.Random) -> RealmInstance:
+    events = []
+    for _ in range(floors - 1):
+        if rng.random() < 0.7:
+            events.append(FloorEvent(type="monster", data={"id": str(rng.randint(1, 40))}))
+        else:
+            events.append(FloorEvent(type="treasure", data={"rewards": {"gold": rng.randint(50, 150) * 20}}))
+    events.append(FloorEvent(type="boss", data={"id": str(rng.randint(1, 10))}))
+    return RealmInstance(id=f"dynamic_20_{int(time.time())}", total_floors=floors, floors=events)
+
+def legacy_advance(blob: str, index: int):
+    data = json.loads(blob)
+    floors = [FloorEvent(**f) for f in data.get("floors", [])]
+    data["floors"] = floors
+    instance = RealmInstance(**data)
+    return instance.total_floors, instance.floors[index]
+
+def codec_advance(blob: bytes, index: int):
+    return read_header(blob).total_floors, decode_floor(blob, index)
+
+def time_per_call(func, blobs, floors: int) -> float:
+    start = time.perf_counter()
+    for blob in blobs:
+        for i in range(floors):
+            func(blob, i)
+    return (time.perf_counter() - start) / (len(blobs) * floors) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--floors", type=int, default=15)
+    parser.add_argument("--realms", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    realms = [make_realm(args.floors, rng) for _ in range(args.realms)]
+    legacy = [json.dumps(asdict(r)) for r in realms]
+    encoded = [encode_realm(r) for r in realms]
+
+    for blob_old, blob_new in zip(legacy, encoded):
+        assert [legacy_advance(blob_old, i) for i in range(args.floors)] == \
+               [codec_advance(blob_new, i) for i in range(args.floors)]
+
+    legacy_bytes = statistics.mean(len(b.encode("utf-8")) for b in legacy)
+    codec_bytes = statistics.mean(len(b) for b in encoded)
+    legacy_us = time_per_call(legacy_advance, legacy, args.floors)
+    codec_us = time_per_call(codec_advance, encoded, args.floors)
+
+    print(f"秘境数: {args.realms}, 每个秘境层数: {args.floors}")
+    print(f"{'格式':<8}{'字节/秘境':>12}{'微秒/前进':>12}")
+    print(f"{'JSON':<8}{legacy_bytes:>12.1f}{legacy_us:>12.2f}")
+    print(f"{'codec':<8}{codec_bytes:>12.1f}{codec_us:>12.2f}")
+    seeded_bytes = len(encode_seeded_realm(realms[0].id, rng.getrandbits(48), 20, 0, args.floors))
+    print(f"{'seeded':<8}{seeded_bytes:>12.1f}{'-':>12}")
+    print(f"体积 {codec_bytes / legacy_bytes:.1%}，解码耗时 {codec_us / legacy_us:.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+# tools/load_benchmark.py
+"""端到端压测：直接调用 XiuXianPlugin 的指令处理函数，统计各指令的延迟与吞吐。
+
+在临时目录中新建数据库，注册 N 名合成玩家（境界、灵石随机分布），随后由若干并发
+“用户”按固定权重发送指令：签到、闭关/出关、探索秘境/前进、购买、讨伐boss、切磋等。
+已在闭关或秘境中的玩家优先发送出关/前进，使指令序列贴近真实玩家。
+
+输出每条指令的 p50/p95/p99 延迟（毫秒）与每次指令触发的 SQLite 提交数，以及总吞吐量。
+表格按指令名排序、列宽固定，同一 --seed 下指令分布相同，便于在两个版本间直接 diff；
+--json 可另存一份机器可读的结果。
+
+用法: python tools/load_benchmark.py [--players N] [--commands N] [--concurrency N]
+                                     [--seed N] [--write-behind] [--config overrides.json] [--json out.json]
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import types
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import _bootstrap
+
+_bootstrap.install()
+
+from astrbot.core.message.components import At  # noqa: E402
+from xiuxian.main import XiuXianPlugin  # noqa: E402
+
+# 指令权重：大致对应群内的实际使用比例
+COMMAND_WEIGHTS = {
+    "签到": 10,
+    "我的信息": 10,
+    "闭关": 8,
+    "探索秘境": 12,
+    "购买": 10,
+    "查看世界boss": 5,
+    "讨伐boss": 10,
+    "切磋": 8,
+}
+BACKGROUND = "(后台)"
+
+_current_command: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("bench_command", default=None)
+
+class BenchEvent:
+    """只实现指令处理函数用到的 AstrMessageEvent 接口"""
+
+    def __init__(self, user_id: str, message: str, mentions: Optional[List[str]] = None):
+        self.user_id = user_id
+        self.message = message
+        self.message_obj = types.SimpleNamespace(
+            message=[At(qq=m, name=f"道友{m}") for m in (mentions or [])]
+        )
+
+    def get_sender_id(self) -> str:
+        return self.user_id
+
+    def get_sender_name(self) -> str:
+        return f"道友{self.user_id}"
+
+    def get_message_str(self) -> str:
+        return self.message
+
+    def get_group_id(self):
+        return None
+
+    def plain_result(self, text: str) -> str:
+        return text
+
+    async def send(self, message):
+        pass
+
+class LoadBenchmark:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.workdir = Path(tempfile.mkdtemp(prefix="xiuxian_bench_"))
+        config = _bootstrap.default_plugin_config(args.config)
+        # 绝对路径会覆盖数据目录，压测数据库始终位于临时目录
+        config.setdefault("FILES", {})["DATABASE_FILE"] = str(self.workdir / "bench.db")
+        config["FILES"]["CONFIG_WATCH_INTERVAL"] = 0
+        if args.write_behind:
+            config.setdefault("PERFORMANCE", {})["WRITE_BEHIND_ENABLED"] = True
+        self.plugin = XiuXianPlugin(None, config)
+        self.user_ids = [str(100000 + i) for i in range(args.players)]
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.commits: Dict[str, int] = defaultdict(int)
+        self.item_names: List[str] = []
+        self.boss_ids: List[str] = []
+
+    def _count_commits(self):
+        conn = self.plugin.db.conn
+        original_commit = conn.commit
+
+        async def commit():
+            self.commits[_current_command.get() or BACKGROUND] += 1
+            await original_commit()
+
+        conn.commit = commit
+
+    async def setup(self):
+        plugin = self.plugin
+        await plugin.initialize()
+        self._count_commits()
+        level_count = len(plugin.config_manager.level_data)
+        cultivation = plugin.player_handler.cultivation_manager
+        for user_id in self.user_ids:
+            async for _ in plugin.handle_start_xiuxian(BenchEvent(user_id, "我要修仙")):
+                pass
+            player = await plugin.db.get_player_by_id(user_id)
+            player.level_index = self.rng.randrange(min(level_count, 10))
+            player.gold = self.rng.randint(500, 50000)
+            for key, value in cultivation._calculate_base_stats(player.level_index).items():
+                setattr(player, key, value)
+            await plugin.db.update_player(player)
+        await plugin.db.flush_pending_players()
+
+        self.item_names = sorted(item.name for item in plugin.config_manager.item_data.values() if item.price > 0)
+        active = await plugin.combat_handler.battle_manager.ensure_bosses_are_spawned()
+        self.boss_ids = sorted(instance.boss_id for instance, _ in active)
+        self.commits.clear()
+
+    async def _dispatch(self, user_id: str, command: str, rng: random.Random):
+        plugin = self.plugin
+        if command == "购买":
+            item_name = rng.choice(self.item_names)
+            return plugin.handle_buy(BenchEvent(user_id, f"购买 {item_name}"), item_name, 1)
+        if command == "讨伐boss":
+            boss_id = rng.choice(self.boss_ids) if self.boss_ids else "0"
+            return plugin.handle_fight_boss(BenchEvent(user_id, f"讨伐boss {boss_id}"), boss_id)
+        if command == "切磋":
+            target = rng.choice(self.user_ids)
+            return plugin.handle_spar(BenchEvent(user_id, "切磋", [target]))
+        handlers = {
+            "签到": plugin.handle_check_in,
+            "我的信息": plugin.handle_player_info,
+            "闭关": plugin.handle_start_cultivation,
+            "出关": plugin.handle_end_cultivation,
+            "探索秘境": plugin.handle_enter_realm,
+            "前进": plugin.handle_realm_advance,
+            "查看世界boss": plugin.handle_boss_list,
+        }
+        return handlers[command](BenchEvent(user_id, command))
+
+    async def _pick_command(self, user_id: str, rng: random.Random) -> str:
+        command = rng.choices(list(COMMAND_WEIGHTS), weights=list(COMMAND_WEIGHTS.values()))[0]
+        # 状态查询走玩家缓存，不计入延迟
+        player = await self.plugin.db.get_player_by_id(user_id)
+        if player and player.state == "修炼中" and rng.random() < 0.8:
+            return "出关"
+        if player and player.realm_id and rng.random() < 0.8:
+            return "前进"
+        return command
+
+    async def _worker(self, worker_id: int, commands: int):
+        rng = random.Random(self.args.seed * 1000 + worker_id)
+        for _ in range(commands):
+            user_id = rng.choice(self.user_ids)
+            command = await self._pick_command(user_id, rng)
+            token = _current_command.set(command)
+            try:
+                start = time.perf_counter()
+                async for _ in await self._dispatch(user_id, command, rng):
+                    pass
+                self.latencies[command].append(time.perf_counter() - start)
+            finally:
+                _current_command.reset(token)
+
+    async def run(self) -> dict:
+        await self.setup()
+        concurrency = max(1, self.args.concurrency)
+        per_worker = [self.args.commands // concurrency + (1 if i < self.args.commands % concurrency else 0)
+                      for i in range(concurrency)]
+        random.seed(self.args.seed)
+        start = time.perf_counter()
+        await asyncio.gather(*(self._worker(i, n) for i, n in enumerate(per_worker)))
+        await self.plugin.db.flush_pending_players()
+        elapsed = time.perf_counter() - start
+        await self.plugin.terminate()
+        return self._report(elapsed)
+
+    def _report(self, elapsed: float) -> dict:
+        def percentile(samples: List[float], q: float) -> float:
+            ordered = sorted(samples)
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+        rows = {}
+        for command in sorted(self.latencies):
+            samples = self.latencies[command]
+            rows[command] = {
+                "count": len(samples),
+                "p50_ms": round(percentile(samples, 0.50), 3),
+                "p95_ms": round(percentile(samples, 0.95), 3),
+                "p99_ms": round(percentile(samples, 0.99), 3),
+                "commits_per_command": round(self.commits.get(command, 0) / len(samples), 3),
+            }
+        total = sum(len(s) for s in self.latencies.values())
+        return {
+            "players": self.args.players,
+            "commands": total,
+            "concurrency": self.args.concurrency,
+            "seed": self.args.seed,
+            "write_behind": bool(self.args.write_behind),
+            "sqlite": sqlite3.sqlite_version,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_per_s": round(total / elapsed, 1) if elapsed else 0.0,
+            "total_commits": sum(self.commits.values()),
+            "background_commits": self.commits.get(BACKGROUND, 0),
+            "per_command": rows,
+        }
+
+def print_report(result: dict):
+    print(f"玩家 {result['players']}  指令 {result['commands']}  并发 {result['concurrency']}  "
+          f"seed {result['seed']}  延迟写入 {'开' if result['write_behind'] else '关'}  SQLite {result['sqlite']}")
+    print(f"{'指令':<12}{'次数':>4}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'提交/次':>9}")
+    for command, row in result["per_command"].items():
+        # 中文字符在等宽终端占两列，按显示宽度补齐
+        pad = 14 - sum(2 if ord(ch) > 0x7F else 1 for ch in command)
+        print(f"{command}{' ' * max(1, pad)}{row['count']:>6}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}"
+              f"{row['p99_ms']:>10.3f}{row['commits_per_command']:>9.3f}")
+    print(f"总耗时 {result['elapsed_s']:.3f}s，吞吐 {result['throughput_per_s']:.1f} 条/秒，"
+          f"SQLite 提交 {result['total_commits']} 次（其中后台 {result['background_commits']} 次）")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=500, help="合成玩家数")
+    parser.add_argument("--commands", type=int, default=5000, help="发送的指令总数")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时发送指令的用户数")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--write-behind", action="store_true", help="开启 PERFORMANCE.WRITE_BEHIND_ENABLED")
+    parser.add_argument("--config", default=None, help="覆盖插件配置项的 JSON 文件")
+    parser.add_argument("--json", default=None, help="把结果另存为 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="显示插件日志")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+    result = asyncio.run(LoadBenchmark(args).run())
+    print_report(result)
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+
+if __name__ == "__main__":
+    sys.exit(main())